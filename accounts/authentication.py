@@ -13,8 +13,8 @@ class CustomAuthenticationBackend(object):
         except User.DoesNotExist:
             return None
 
-    def get_user(self, name):
+    def get_user(self, user_id):
         try:
-            return User.objects.get(name=name)
+            return User.objects.get(pk=user_id)
         except User.DoesNotExist:
             return None
@@ -2,6 +2,9 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import PasswordResetForm
+
+from accounts.tasks import send_password_reset_email
 
 User = get_user_model()
 
@@ -85,3 +88,18 @@ class CreateAccountForm(forms.ModelForm):
         super(CreateAccountForm, self).__init__(*args, **kwargs)
         self.fields["email"].label = ""
         self.fields["name"].label = ""
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+
+    # the mail is sent by the task worker instead of during the request. The
+    # job keeps the user's id rather than the reset link, the worker makes
+    # the token when it sends the mail.
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        user_id = context['user'].pk
+        context = {key: value for key, value in context.items() if key not in ('user', 'uid', 'token')}
+        send_password_reset_email.enqueue(
+            user_id, subject_template_name, email_template_name, context, from_email, to_email,
+            html_email_template_name,
+        )
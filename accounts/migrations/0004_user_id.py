@@ -0,0 +1,80 @@
+from django.db import migrations, models
+
+
+def user_references(apps):
+    # every (model, foreign key) holding a user's primary key: the foreign
+    # keys of other models and the user side of the many to many tables
+    User = apps.get_model('accounts', 'User')
+    references = []
+    for relation in User._meta.related_objects:
+        if relation.many_to_many:
+            through = relation.through
+            references.append((through, through._meta.get_field(relation.field.m2m_reverse_field_name())))
+        else:
+            references.append((relation.related_model, relation.field))
+    for field in User._meta.local_many_to_many:
+        through = field.remote_field.through
+        references.append((through, through._meta.get_field(field.m2m_field_name())))
+    return references
+
+
+def number_users(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    names = User.objects.order_by('date_joined', 'name').values_list('name', flat=True)
+    for number, name in enumerate(list(names), 1):
+        User.objects.filter(name=name).update(id=number)
+
+    # the referencing columns still have the name's type, they get the
+    # integer type once the key has moved
+    quote = schema_editor.quote_name
+    user_table = quote(User._meta.db_table)
+    for model, field in user_references(apps):
+        table, column = quote(model._meta.db_table), quote(field.column)
+        schema_editor.execute(
+            f'UPDATE {table} SET {column} = '
+            f'(SELECT {quote("id")} FROM {user_table} WHERE {quote("name")} = {table}.{column}) '
+            f'WHERE {column} IS NOT NULL'
+        )
+
+    # sessions store the old key of their user
+    apps.get_model('sessions', 'Session').objects.all().delete()
+
+
+def point_references_at_id(apps, schema_editor):
+    for model, field in user_references(apps):
+        name, path, args, kwargs = field.deconstruct()
+        kwargs.update(to=field.remote_field.model, to_field='name')
+        old_field = field.__class__(*args, **kwargs)
+        old_field.set_attributes_from_name(name)
+        old_field.model = model
+        schema_editor.alter_field(model, old_field, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_auto_20230320_1608'),
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('issues', '0020_comment_thread_index'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_users),
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='name',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.RunPython(point_references_at_id),
+    ]
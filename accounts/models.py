@@ -40,7 +40,6 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(
         max_length=64,
         unique=True,
-        primary_key=True,
         )
     email = models.EmailField(
         _("Email Address"),
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import PasswordResetForm
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from tasks.queue import task
+
+User = get_user_model()
+
+
+@task
+def send_password_reset_email(user_id, subject_template_name, email_template_name, context,
+                              from_email, to_email, html_email_template_name=None):
+    # the link is made here so the job table never holds a usable token
+    user = User.objects.get(pk=user_id)
+    context.update(
+        user=user,
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user),
+    )
+    PasswordResetForm().send_mail(
+        subject_template_name, email_template_name, context, from_email, to_email, html_email_template_name,
+    )
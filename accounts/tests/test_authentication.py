@@ -36,11 +36,11 @@ class AuthenticateTest(TestCase):
 
 class GetUserTest(TestCase):
 
-    def test_gets_user_by_name(self):
-        User.objects.create(name="chondosha", email="user1234@example.org", password="chondosha5563")
+    def test_gets_user_by_id(self):
+        user = User.objects.create(name="chondosha", email="user1234@example.org", password="chondosha5563")
         desired_user = User.objects.get(email="user1234@example.org")
-        found_user = CustomAuthenticationBackend().get_user('chondosha')
+        found_user = CustomAuthenticationBackend().get_user(user.pk)
         self.assertEqual(found_user, desired_user)
 
-    def test_returns_None_if_no_user_with_email(self):
-        self.assertIsNone(CustomAuthenticationBackend().get_user('chondosha'))
+    def test_returns_None_if_no_user_with_id(self):
+        self.assertIsNone(CustomAuthenticationBackend().get_user(1))
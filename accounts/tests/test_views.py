@@ -1,8 +1,15 @@
-from django.test import TestCase
+import json
+
+from django.core import mail
+from django.contrib.auth.tokens import default_token_generator
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.db.utils import IntegrityError
 from unittest import skip
 
+from tasks.models import Job
+from tasks.queue import claim_job, run_job
+
 User = get_user_model()
 
 class LoginViewTest(TestCase):
@@ -49,7 +56,7 @@ class LoginViewTest(TestCase):
             follow=True
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.redirect_chain[-1][0], '/user_home/chondosha')
+        self.assertEqual(response.redirect_chain[-1][0], f'/user_home/{user.pk}')
 
 
 class CreateAccountviewTest(TestCase):
@@ -108,3 +115,40 @@ class CreateAccountviewTest(TestCase):
         )
         new_user = User.objects.first()
         self.assertEqual(new_user.email, 'user1234@example.org')
+
+
+class PasswordResetViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="chondosha", email="user1234@example.org", password="chondosha5563")
+
+    def test_POST_sends_reset_email(self):
+        response = self.client.post('/accounts/forgot-password', data={'email': 'user1234@example.org'})
+        self.assertRedirects(response, '/accounts/password-reset/done')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user1234@example.org'])
+
+    @override_settings(TASKS_EAGER=False)
+    def test_reset_email_is_sent_by_the_worker(self):
+        self.client.post('/accounts/forgot-password', data={'email': 'user1234@example.org'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().name, 'accounts.tasks.send_password_reset_email')
+
+        self.assertTrue(run_job(claim_job()))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/accounts/reset/', mail.outbox[0].body)
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(TASKS_EAGER=False)
+    def test_queued_job_holds_no_reset_link(self):
+        self.client.post('/accounts/forgot-password', data={'email': 'user1234@example.org'})
+        job = Job.objects.get()
+        token = default_token_generator.make_token(self.user)
+        self.assertEqual(job.args[0], self.user.pk)
+        self.assertNotIn(token, json.dumps([job.args, job.kwargs]))
+        self.assertFalse({'uid', 'token', 'user'} & set(job.args[3]))
+
+        run_job(claim_job())
+        link = mail.outbox[0].body.split('/accounts/reset/')[1].split()[0]
+        response = self.client.get('/accounts/reset/' + link)
+        self.assertRedirects(response, '/accounts/reset/%s/set-password/' % link.split('/')[0])
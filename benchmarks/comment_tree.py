@@ -0,0 +1,149 @@
+"""
+Compares loading an issue's comment tree the old way (one query per node
+plus a recursive reply count) with build_comment_tree over every
+comment read in a single query, and with load_comment_page, which only
+reads the first page of threads and their first replies.
+
+Runs against a throwaway in-memory test database:
+
+    python benchmarks/comment_tree.py
+    python benchmarks/comment_tree.py --sizes 1000 10000 --naive-limit 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'issue_tracker.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from issues.models import Comment, Issue, Project
+from issues.comment_tree import build_comment_tree, load_comment_page
+
+User = get_user_model()
+
+
+def seed_issue(user, project, size):
+    issue = Issue.objects.create(
+        title=f'Benchmark issue ({size} comments)',
+        project=project,
+        summary='Benchmark issue',
+        created_by=user,
+        modified_by=user,
+    )
+    start = (Comment.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+    now = timezone.now()
+    comments = []
+    for i in range(size):
+        comment_id = start + i
+        parent = None
+        # a third of the comments start a new thread, the rest reply to a
+        # random earlier comment
+        if comments and random.random() > 0.33:
+            parent = random.choice(comments)
+        comments.append(Comment(
+            id=comment_id,
+            user=user,
+            issue=issue,
+            text=f'Comment {i}',
+            parent_comment_id=parent.id if parent else None,
+            depth=parent.depth + 1 if parent else 0,
+            path=f'{parent.path if parent else ""}{comment_id:0{Comment.PATH_STEP_WIDTH}d}/',
+            created_at=now,
+        ))
+    Comment.objects.bulk_create(comments, batch_size=500)
+    return issue
+
+
+def recursive_reply_count(comment):
+    total = comment.replies.count()
+    for reply in comment.replies.all():
+        total += recursive_reply_count(reply)
+    return total
+
+
+def walk_naive(comments):
+    for comment in comments:
+        str(comment.user)
+        replies = comment.replies.all()
+        if len(replies):
+            recursive_reply_count(comment)
+            walk_naive(replies)
+
+
+def walk_tree(comments):
+    for comment in comments:
+        str(comment.user)
+        if comment.children:
+            comment.descendant_count
+            walk_tree(comment.children)
+
+
+def load_whole_tree(issue):
+    comments = Comment.objects.filter(issue=issue).select_related('user').order_by('path')
+    return build_comment_tree(list(comments))
+
+
+def measure(func):
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    return len(queries), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--naive-limit', type=int, default=1000,
+                        help='skip the old per-node loading above this many comments')
+    args = parser.parse_args()
+
+    random.seed(0)
+    # the query budgets would fail the larger pages in DEBUG
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0)
+
+    user = User.objects.create(name='bench', email='bench@example.org')
+    project = Project.objects.create(title='Benchmark', summary='Benchmark', created_by=user, modified_by=user)
+    client = Client()
+
+    print(f"{'comments':>10} {'method':>16} {'queries':>10} {'seconds':>10}")
+    for size in args.sizes:
+        issue = seed_issue(user, project, size)
+
+        if size <= args.naive_limit:
+            top_level = Comment.objects.filter(issue=issue, parent_comment=None)
+            queries, elapsed = measure(lambda: walk_naive(top_level))
+            print(f"{size:>10} {'per-node':>16} {queries:>10} {elapsed:>10.3f}")
+        else:
+            print(f"{size:>10} {'per-node':>16} {'skipped':>10} {'':>10}")
+
+        queries, elapsed = measure(lambda: walk_tree(load_whole_tree(issue)))
+        print(f"{size:>10} {'single query':>16} {queries:>10} {elapsed:>10.3f}")
+
+        queries, elapsed = measure(lambda: walk_tree(load_comment_page(issue)[0]))
+        print(f"{size:>10} {'first page':>16} {queries:>10} {elapsed:>10.3f}")
+
+        queries, elapsed = measure(lambda: client.get(f'/issue_details/{issue.id}'))
+        print(f"{size:>10} {'issue_details':>16} {queries:>10} {elapsed:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Compares the user references keyed by name (accounts 0003) with the integer
+keys of accounts 0004: the size of the indexes on the user columns and the
+time of joins from issues, comments and the assignment tables to the users.
+
+Seeds a throwaway SQLite database at the old schema, measures, applies the
+migration to it and measures again:
+
+    python benchmarks/user_keys.py
+    python benchmarks/user_keys.py --users 5000 --issues 50000 --comments 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'issue_tracker.settings')
+
+import django
+from django.conf import settings
+
+OLD_SCHEMA = [('accounts', '0003_auto_20230320_1608'), ('issues', '0020_comment_thread_index')]
+
+JOINS = {
+    'issue creators': (
+        'SELECT count(*) FROM issues_issue i '
+        'JOIN accounts_user u ON u.{key} = i.created_by_id'
+    ),
+    'comment authors': (
+        'SELECT count(*) FROM issues_comment c '
+        'JOIN accounts_user u ON u.{key} = c.user_id'
+    ),
+    'assigned issues': (
+        'SELECT count(*) FROM accounts_user u '
+        'JOIN issues_issue_assigned_users a ON a.user_id = u.{key} '
+        'JOIN issues_issue i ON i.id = a.issue_id'
+    ),
+    "one user's comments": (
+        'SELECT count(*) FROM issues_comment c '
+        'JOIN accounts_user u ON u.{key} = c.user_id WHERE u.name = %s'
+    ),
+}
+
+
+def seed(apps, users, issues, comments):
+    User = apps.get_model('accounts', 'User')
+    Project = apps.get_model('issues', 'Project')
+    Issue = apps.get_model('issues', 'Issue')
+    Comment = apps.get_model('issues', 'Comment')
+
+    user_list = User.objects.bulk_create(
+        [User(name=f'benchmark-user-{i:06d}', email=f'user{i}@example.org') for i in range(users)],
+        batch_size=500,
+    )
+    projects = Project.objects.bulk_create([
+        Project(id=i + 1, title=f'Project {i}', summary='Benchmark', created_by=random.choice(user_list),
+                modified_by=random.choice(user_list))
+        for i in range(max(1, issues // 100))
+    ])
+    issue_list = Issue.objects.bulk_create([
+        Issue(id=i + 1, title=f'Issue {i}', summary='Benchmark', project=random.choice(projects),
+              created_by=random.choice(user_list), modified_by=random.choice(user_list))
+        for i in range(issues)
+    ], batch_size=500)
+    Assignment = Issue.assigned_users.through
+    Assignment.objects.bulk_create([
+        Assignment(issue_id=issue.id, user_id=user.pk)
+        for issue in issue_list for user in random.sample(user_list, 2)
+    ], batch_size=500)
+    Comment.objects.bulk_create([
+        Comment(id=i + 1, user=random.choice(user_list), issue=random.choice(issue_list),
+                text=f'Comment {i}', path=f'{i + 1:010d}/')
+        for i in range(comments)
+    ], batch_size=500)
+    return [user.name for user in user_list]
+
+
+def index_sizes(connection):
+    # every index over a column holding a user key, and the user table's own
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT i.name FROM sqlite_master i WHERE i.type = 'index' AND ("
+            " i.tbl_name = 'accounts_user' OR EXISTS ("
+            "  SELECT 1 FROM pragma_index_info(i.name) c"
+            "  WHERE c.name IN ('user_id', 'created_by_id', 'modified_by_id', 'closed_by_id')))"
+        )
+        names = [name for name, in cursor.fetchall()]
+        sizes = {}
+        for name in names:
+            cursor.execute('SELECT sum(pgsize) FROM dbstat WHERE name = %s', [name])
+            sizes[name] = cursor.fetchone()[0]
+    return sizes
+
+
+def time_joins(connection, key, names, repeat):
+    timings = {}
+    with connection.cursor() as cursor:
+        for label, sql in JOINS.items():
+            params = [random.choice(names)] if '%s' in sql else []
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                cursor.execute(sql.format(key=key), params)
+                cursor.fetchall()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    settings.DATABASES['default']['NAME'] = path
+    django.setup()
+
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    try:
+        executor = MigrationExecutor(connection)
+        executor.migrate(OLD_SCHEMA)
+        names = seed(executor.loader.project_state(OLD_SCHEMA).apps, args.users, args.issues, args.comments)
+
+        old_sizes = index_sizes(connection)
+        old_joins = time_joins(connection, 'name', names, args.repeat)
+
+        executor = MigrationExecutor(connection)
+        start = time.perf_counter()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        migrated = time.perf_counter() - start
+
+        new_sizes = index_sizes(connection)
+        new_joins = time_joins(connection, 'id', names, args.repeat)
+    finally:
+        connection.close()
+        os.remove(path)
+
+    print(f'{args.users} users, {args.issues} issues, {args.comments} comments, migrated in {migrated:.2f}s')
+    print()
+    print(f"{'indexes':<20} {'count':>8} {'KiB':>10}")
+    for label, sizes in [('name keys', old_sizes), ('integer keys', new_sizes)]:
+        print(f'{label:<20} {len(sizes):>8} {sum(sizes.values()) / 1024:>10.0f}')
+    print()
+    print(f"{'join':<20} {'name keys':>12} {'integer keys':>14} {'speedup':>10}")
+    for label in JOINS:
+        old, new = old_joins[label], new_joins[label]
+        print(f'{label:<20} {old * 1000:>10.2f}ms {new * 1000:>12.2f}ms {old / new:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -35,12 +35,14 @@ class AddAndDeleteCommentsTest(FunctionalTest):
         self.assertIn('This is a great issue', comments)
 
         # on their comment they see a link that says 'reply'
-        reply_link = self.wait_for_element_link('Reply')
+        reply_link = self.wait_for_element_id('reply-link-1')
+        self.assertEqual(reply_link.text, 'Reply')
 
         # they click it an another small text box appears below their comment
+        # (the page has one reply form, it moves under the comment)
         reply_link.click()
-        reply_box = self.browser.find_elements(By.NAME, 'text')[2] # there is first comment then first edit
-        submit_btn = self.browser.find_elements(By.ID, 'comment-btn')[1]
+        reply_box = self.wait_for_element_selector('.reply-form-1 textarea[name="text"]')
+        submit_btn = self.wait_for_element_selector('.reply-form-1 #reply-btn')
 
         # they enter 'This is a great comment' and click submit
         reply_box.send_keys('This is a great comment')
@@ -55,10 +57,9 @@ class AddAndDeleteCommentsTest(FunctionalTest):
         self.assertIn('This is a great comment', comments)
 
         # they see the reply has a reply button and does the same again, typing 'This is a great reply'
-        reply_link = self.browser.find_elements(By.LINK_TEXT, 'Reply')[1]
-        reply_link.click()
-        reply_box = self.browser.find_elements(By.NAME, 'text')[4]
-        submit_btn = self.browser.find_elements(By.ID, 'comment-btn')[2]
+        self.wait_for_element_id('reply-link-2').click()
+        reply_box = self.wait_for_element_selector('.reply-form-2 textarea[name="text"]')
+        submit_btn = self.wait_for_element_selector('.reply-form-2 #reply-btn')
 
         reply_box.send_keys('This is a great reply')
         submit_btn.click()
@@ -75,11 +76,11 @@ class AddAndDeleteCommentsTest(FunctionalTest):
         # they see each comment has an edit button
         # they press edit and the comment becomes a text box where the user can change the text
         # they change the first reply to 'This is a great comment but mine is better' and hit enter
-        edit_link = self.browser.find_elements(By.LINK_TEXT, 'Edit')[1]
+        edit_link = self.wait_for_element_id('edit-link-2')
         edit_link.click()
         edit_link.click()
-        edit_box = self.browser.find_elements(By.NAME, 'text')[3]
-        edit_btn = self.browser.find_elements(By.ID, 'edit-btn')[1]
+        edit_box = self.wait_for_element_selector('.comment-form-2 textarea[name="text"]')
+        edit_btn = self.wait_for_element_selector('.comment-form-2 #edit-btn')
         edit_box.send_keys(' but mine is better')
         edit_btn.click()
 
@@ -43,7 +43,8 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'issues',
-    'accounts'
+    'accounts',
+    'tasks',
 ]
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -52,6 +53,7 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'issues.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'issues.context_processors.permissions',
             ],
         },
     },
@@ -93,6 +96,30 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# The sidebars, cached pages and comment trees are invalidated by the task
+# worker and management commands too, so every process has to share one cache.
+# The files cost no database queries, which keeps the query budgets honest.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            # one comment tree per issue page and a sidebar per user
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+SIDEBAR_CACHE_TIMEOUT = 300
+
+# the tests get an empty cache directory of their own
+TEST_RUNNER = 'issue_tracker.test_runner.TestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -147,6 +174,125 @@ EMAIL_HOST_USER = 'chonmailservice@gmail.com'
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 
 
+# Visit counters
+# page views are buffered per worker and flushed in batches every
+# VISIT_COUNTER_FLUSH_INTERVAL seconds, in development they are written immediately
+
+VISIT_COUNTER_FLUSH_INTERVAL = 0 if DEBUG else 30
+VISIT_COUNTER_MAX_PENDING = 1000
+# how often the workers check whether flush_visits asked them to flush
+VISIT_COUNTER_REQUEST_POLL_INTERVAL = 5
+
+# each flushed visit adds 2^((now - HOTNESS_EPOCH) / HOTNESS_HALF_LIFE) to the
+# hotness score the popular filters sort by, so a visit's weight halves every
+# half life (in seconds) compared to newer visits. The score grows by about
+# 2^120 a year with a three day half life and passes the float limit of 2^1024
+# about eight years after the epoch, from then on visits are still counted but
+# the scores stop growing and every flush logs an error. Before then, move the
+# epoch forward and run `manage.py rescale_hotness --previous-epoch <old epoch>`
+# right after deploying the change.
+
+HOTNESS_EPOCH = 1767225600  # 2026-01-01 UTC
+HOTNESS_HALF_LIFE = 3 * 24 * 60 * 60
+
+
+# Page cache
+# the public list and detail pages are cached for anonymous visitors for
+# PAGE_CACHE_TIMEOUT seconds, in development pages are always rendered
+
+PAGE_CACHE_TIMEOUT = 0 if DEBUG else 60
+
+
+# Pagination
+# list views use numbered pages unless KEYSET_PAGINATION is set, a ?cursor=
+# parameter switches a single request to cursor pages
+
+KEYSET_PAGINATION = False
+
+# the issue page shows the first COMMENT_THREADS_PER_PAGE top level comments
+# with their first COMMENT_INLINE_REPLIES replies, the rest is loaded on
+# demand COMMENT_REPLIES_PER_PAGE comments at a time
+
+COMMENT_THREADS_PER_PAGE = 20
+COMMENT_INLINE_REPLIES = 3
+COMMENT_REPLIES_PER_PAGE = 20
+
+# rendered comment trees are cached until a comment of the issue changes, in
+# development they are always rendered
+
+COMMENT_TREE_CACHE_TIMEOUT = 0 if DEBUG else 300
+
+
+# Archive
+# the archive_issues command moves issues closed more than
+# ARCHIVE_CLOSED_ISSUES_AFTER days ago, with their comments, out of the live
+# tables ARCHIVE_BATCH_SIZE issues at a time
+
+ARCHIVE_CLOSED_ISSUES_AFTER = 90
+ARCHIVE_BATCH_SIZE = 100
+
+
+# Deletion
+# deleted projects and issues are hidden right away and removed with their
+# comments by the purge_deleted command, PURGE_BATCH_SIZE rows per transaction
+
+PURGE_BATCH_SIZE = 500
+
+
+# Background tasks
+# slow work like sending mail and purging deleted rows is stored as a job and
+# run by the run_tasks command on TASKS_WORKER_THREADS threads, in development
+# tasks run right away inside the request. A failed job is retried after
+# TASKS_RETRY_DELAY seconds, doubling up to TASKS_MAX_RETRY_DELAY, until it has
+# run TASKS_MAX_ATTEMPTS times. Jobs running longer than TASKS_JOB_TIMEOUT
+# seconds are taken over when a worker starts.
+
+TASKS_EAGER = DEBUG
+TASKS_WORKER_THREADS = 4
+TASKS_POLL_INTERVAL = 1
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_MAX_RETRY_DELAY = 3600
+TASKS_JOB_TIMEOUT = 600
+
+
+# Query budgets
+# QueryBudgetMiddleware logs the number of queries and the SQL time of every
+# request, with DEBUG on a view that runs more queries than its budget fails.
+# None enables it whenever DEBUG is on when the server starts, so test runs,
+# which turn DEBUG off, leave it out.
+
+QUERY_BUDGET_MIDDLEWARE = None
+QUERY_BUDGETS = {
+    'issues:home': 2,
+    'issues:search': 12,
+    'issues:issue_list': 6,
+    'issues:issue_details': 10,
+    'issues:create_issue': 12,
+    'issues:update_issue': 9,
+    'issues:delete_issue': 10,
+    'issues:add_user_to_issue': 12,
+    'issues:remove_user_from_issue': 12,
+    'issues:open_issue': 10,
+    'issues:close_issue': 10,
+    'issues:add_comment': 11,
+    'issues:reply_comment': 12,
+    'issues:edit_comment': 9,
+    'issues:delete_comment': 18,
+    'issues:issue_comments': 5,
+    'issues:comment_replies': 4,
+    'issues:project_list': 6,
+    'issues:project_details': 10,
+    'issues:create_project': 8,
+    'issues:update_project': 7,
+    'issues:delete_project': 10,
+    'issues:add_user_to_project': 10,
+    'issues:remove_user_from_project': 10,
+    'issues:user_home': 7,
+    'issues:user_profile': 7,
+}
+
+
 # Logging
 
 LOGGING = {
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from issues import search
+from issues.models import Issue, Comment, ArchivedIssue, ArchivedComment
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_CLOSED_ISSUES_AFTER', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_issues(cutoff):
+    return Issue.objects.filter(issue_status=Issue.CLOSED, closed_on__lt=cutoff)
+
+
+def copied_fields(model):
+    # the columns an archive row takes over from the live row
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'archived_on']
+
+
+def archive_issues(issue_ids):
+    # Moves the issues with their comments and assignments into the archive
+    # tables. Deleting the live rows goes through the usual signals, which
+    # update the project counters and drop the pages and search entries,
+    # so the search entries are added back for the archived rows.
+    with transaction.atomic():
+        issues = [
+            ArchivedIssue(**row)
+            for row in Issue.objects.filter(id__in=issue_ids, issue_status=Issue.CLOSED).values(*copied_fields(ArchivedIssue))
+        ]
+        issue_ids = [issue.id for issue in issues]
+        comments = [
+            ArchivedComment(**row)
+            for row in Comment.objects.filter(issue_id__in=issue_ids).order_by('path').values(*copied_fields(ArchivedComment))
+        ]
+        assignments = list(Issue.assigned_users.through.objects.filter(issue_id__in=issue_ids).values_list('issue_id', 'user_id'))
+
+        ArchivedIssue.objects.bulk_create(issues)
+        ArchivedComment.objects.bulk_create(comments, batch_size=500)
+        Assignment = ArchivedIssue.assigned_users.through
+        Assignment.objects.bulk_create([
+            Assignment(archivedissue_id=issue_id, user_id=user_id) for issue_id, user_id in assignments
+        ], batch_size=500)
+
+        Issue.objects.filter(id__in=issue_ids).delete()
+        search.add_to_index(issues + comments)
+    return len(issues)
+
+
+def archive_closed_issues(cutoff, batch_size=None):
+    # one transaction per batch, so the live table is never locked for long
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 100)
+    archived = 0
+    while True:
+        issue_ids = list(archivable_issues(cutoff).order_by('closed_on', 'id').values_list('id', flat=True)[:batch_size])
+        if not issue_ids:
+            return archived
+        archived += archive_issues(issue_ids)
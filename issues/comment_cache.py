@@ -0,0 +1,63 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from issues.page_cache import tag_versions
+
+OWNER_CONTROL = re.compile(r'<!--((?:edit-form|owner-links):\d+)-->')
+
+
+def comment_tree_timeout():
+    return getattr(settings, 'COMMENT_TREE_CACHE_TIMEOUT', 0)
+
+
+def comments_tag(issue_id):
+    # bumped by every comment change of the issue
+    return f'comments:{issue_id}'
+
+
+def comment_tree_key(issue, variant, parts):
+    sizes = [
+        settings.COMMENT_THREADS_PER_PAGE,
+        settings.COMMENT_INLINE_REPLIES,
+        settings.COMMENT_REPLIES_PER_PAGE,
+    ]
+    parts = [issue.pk, variant, *parts, *sizes, *tag_versions([comments_tag(issue.pk)])]
+    return 'comment-tree:' + hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def render_comment_tree(request, issue, load, *parts):
+    # Renders the comments returned by `load()`, a (comment list, next
+    # cursor, every comment loaded) tuple, or takes them from the cache. The
+    # tree is the same for every signed in user, the controls of the
+    # viewer's own comments are added by add_owner_controls. Returns the
+    # html, the next cursor and the ids of the viewer's comments.
+    member = request.user.is_authenticated
+    timeout = comment_tree_timeout()
+    key = comment_tree_key(issue, 'member' if member else 'anonymous', parts) if timeout else None
+    cached = cache.get(key) if key else None
+    if cached is None:
+        comment_list, cursor, comments = load()
+        html = render_to_string('comment_tree.html', {'comment_list': comment_list, 'issue': issue, 'member': member})
+        cached = (html, cursor, {comment.pk: comment.user_id for comment in comments})
+        if key:
+            cache.set(key, cached, timeout)
+
+    html, cursor, authors = cached
+    own = [pk for pk, author in authors.items() if member and author == request.user.pk]
+    return html, cursor, own
+
+
+def add_owner_controls(request, html, edit_forms):
+    # fills the markers the tree leaves for the edit form and the edit and
+    # delete links, only the viewer's own comments get them
+    controls = {}
+    for comment_id, form in edit_forms.items():
+        context = {'comment': form.instance, 'form': form}
+        controls[f'edit-form:{comment_id}'] = render_to_string('comment_edit_form.html', context, request)
+        controls[f'owner-links:{comment_id}'] = render_to_string('comment_owner_links.html', context, request)
+    return mark_safe(OWNER_CONTROL.sub(lambda match: controls.get(match[1], ''), html))
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+
+from issues.identity import IdentityMap
+from issues.models import Comment
+from issues.pagination import KeysetPaginator
+
+
+def load_archived_comment_tree(issue):
+    # archived threads never change and are shown whole
+    comments = list(issue.comments.select_related('user').order_by('path'))
+    top_level = build_comment_tree(comments)
+    for comment in comments:
+        comment.replies_cursor = None
+    return top_level, comments
+
+
+def build_comment_tree(comments):
+    # Links an issue's comments into a tree in memory. Every comment gets a
+    # `children` list and a `descendant_count` of all replies below it.
+    by_id = {}
+    for comment in comments:
+        comment.children = []
+        comment.descendant_count = 0
+        by_id[comment.id] = comment
+
+    top_level = []
+    for comment in comments:
+        parent = by_id.get(comment.parent_comment_id)
+        if parent is None:
+            top_level.append(comment)
+        else:
+            parent.children.append(comment)
+            comment.parent_comment = parent
+
+    # replies are always created after their parent, so walking from the
+    # newest comment adds every subtree before its parent is reached
+    for comment in sorted(comments, key=lambda c: c.id, reverse=True):
+        parent = by_id.get(comment.parent_comment_id)
+        if parent is not None:
+            parent.descendant_count += comment.descendant_count + 1
+
+    return top_level
+
+
+def descendants_counted():
+    # the replies below a comment are the paths inside its path range
+    counts = (
+        Comment.objects.filter(
+            issue=OuterRef('issue'),
+            path__gt=OuterRef('path'),
+            path__lt=Concat(Substr(OuterRef('path'), 1, Length(OuterRef('path')) - 1), Value('0')),
+        )
+        .order_by()
+        .values('issue')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def children_counted():
+    counts = (
+        Comment.objects.filter(parent_comment=OuterRef('pk'))
+        .order_by()
+        .values('parent_comment')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def comment_rows(issue):
+    return (
+        Comment.objects.filter(issue=issue)
+        .select_related('user')
+        .annotate(descendant_count=descendants_counted(), child_count=children_counted())
+    )
+
+
+def thread_paginator(issue, parent, per_page):
+    # comments of one level in the order they were written, the cursor is
+    # the created_at and id of the last comment shown
+    return KeysetPaginator(comment_rows(issue).filter(parent_comment=parent).order_by('created_at'), per_page)
+
+
+def add_replies(comment, children, paginator):
+    # `replies_cursor` is None when every reply is shown, '' when none of
+    # them has been loaded yet, or the cursor after the last one loaded
+    comment.children = children
+    comment.replies_cursor = None
+    if comment.child_count > len(children):
+        comment.replies_cursor = paginator.encode_cursor('next', children[-1]) if children else ''
+
+
+def load_level(issue, parent, cursor, per_page, identities):
+    page = thread_paginator(issue, parent, per_page).page(cursor)
+    page.object_list = [identities.attach(identities.add(comment)) for comment in page.object_list]
+    return page
+
+
+def load_comment_page(issue, cursor=None, identities=None):
+    # One page of top level comments, each with its first few replies. The
+    # replies of those replies are left for the replies endpoint. Returns the
+    # page and every comment loaded.
+    identities = identities or IdentityMap()
+    identities.add(issue)
+    page = load_level(issue, None, cursor, settings.COMMENT_THREADS_PER_PAGE, identities)
+
+    inline = settings.COMMENT_INLINE_REPLIES
+    first_replies = (
+        Comment.objects.filter(issue=issue, parent_comment=OuterRef('parent_comment'))
+        .order_by('created_at', 'pk')
+        .values('pk')[:inline]
+    )
+    replies = comment_rows(issue).filter(
+        parent_comment__in=[comment.pk for comment in page if comment.child_count],
+        pk__in=Subquery(first_replies),
+    ).order_by()
+    children = {comment.pk: [] for comment in page}
+    for reply in sorted(replies, key=lambda reply: (reply.created_at, reply.pk)):
+        reply = identities.attach(identities.add(reply))
+        add_replies(reply, [], None)
+        children[reply.parent_comment_id].append(reply)
+
+    comments = list(page)
+    for comment in page:
+        add_replies(comment, children[comment.pk], thread_paginator(issue, comment, inline))
+        comments.extend(comment.children)
+    return page, comments
+
+
+def load_replies(parent, cursor=None, identities=None):
+    # the next page of a comment's direct replies
+    identities = identities or IdentityMap()
+    identities.add(parent)
+    page = load_level(parent.issue, parent, cursor, settings.COMMENT_REPLIES_PER_PAGE, identities)
+    for reply in page:
+        add_replies(reply, [], None)
+    return page
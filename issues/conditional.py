@@ -0,0 +1,104 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+
+from issues.counters import visit_counter, visitor_id
+from issues.models import Comment, Issue, Project
+from issues.page_cache import tag_versions
+from issues.sidebar import get_sidebar_lists, sidebar_generation
+
+
+def page_etag(request, tags, *parts):
+    # The page also shows the viewer's controls and their sidebar, which
+    # has its own generation and an order that follows the hotness. The
+    # page cache tags catch the rest, like a renamed project.
+    user = request.user.pk if request.user.is_authenticated else 'anonymous'
+    issues, projects = get_sidebar_lists(request.user)
+    sidebar = [sidebar_generation(request.user), *(issue.pk for issue in issues), '', *(project.pk for project in projects)]
+    # the unique visitor count is allowed to be a day old
+    parts = [*parts, user, *sidebar, *tag_versions(tags), timezone.localdate()]
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def latest(queryset, foreign_key, field):
+    return Subquery(
+        queryset.filter(**{foreign_key: OuterRef('pk')})
+        .order_by()
+        .values(foreign_key)
+        .annotate(latest=Max(field))
+        .values('latest')
+    )
+
+
+def issue_page_stamp(request, tags, issue_id):
+    rows = (
+        Issue.objects.filter(pk=issue_id)
+        .annotate(last_comment=latest(Comment.objects, 'issue', 'updated_at'))
+        .values('modified_on', 'comment_count', 'last_comment', 'project__modified_on')
+        .order_by()
+    )
+    # first() would order by pk, which the join turns into a sort
+    row = next(iter(rows[:1]), None)
+    if row is None:
+        return None
+    last_modified = max(filter(None, [row['modified_on'], row['last_comment'], row['project__modified_on']]))
+    # the count catches deleted comments, which leave no newer timestamp
+    etag = page_etag(request, tags, last_modified.isoformat(), row['comment_count'])
+    return etag, last_modified
+
+
+def project_page_stamp(request, tags, project_id, filter_term=None):
+    row = (
+        Project.objects.filter(pk=project_id)
+        .annotate(last_issue=latest(Issue.objects, 'project', 'modified_on'))
+        .values('modified_on', 'issue_count', 'last_issue')
+        .order_by()
+        .first()
+    )
+    if row is None:
+        return None
+    last_modified = max(filter(None, [row['modified_on'], row['last_issue']]))
+    etag = page_etag(request, tags, last_modified.isoformat(), row['issue_count'])
+    return etag, last_modified
+
+
+def conditional_page(stamp, visit, tags=()):
+    # Answers If-None-Match / If-Modified-Since with a 304 when `stamp`
+    # returns the same (etag, last modified) the client already has. The
+    # visit of the (model, URL kwarg) pair is counted either way, `tags`
+    # are the page cache tags of the page, formatted with the URL kwargs.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            page_tags = [tag.format(**kwargs) for tag in tags]
+            found = None
+            if 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META:
+                found = stamp(request, page_tags, **kwargs)
+                if found is not None:
+                    etag, last_modified = found
+                    response = get_conditional_response(
+                        request, etag=quote_etag(etag), last_modified=int(last_modified.timestamp()),
+                    )
+                    if response is not None:
+                        model, kwarg = visit
+                        visit_counter.record(model, model._meta.pk.to_python(kwargs[kwarg]), visitor_id(request))
+                        return response
+
+            response = view(request, *args, **kwargs)
+            # pages coming from the page cache already carry their stamp
+            if response.status_code == 200 and not response.has_header('ETag'):
+                found = found or stamp(request, page_tags, **kwargs)
+                if found is not None:
+                    etag, last_modified = found
+                    response['ETag'] = quote_etag(etag)
+                    response['Last-Modified'] = http_date(last_modified.timestamp())
+            return response
+        return wrapper
+    return decorator
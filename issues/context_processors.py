@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+
+from issues.permissions import get_permissions
+
+
+def permissions(request):
+    return {'permissions': SimpleLazyObject(lambda: get_permissions(request))}
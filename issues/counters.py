@@ -0,0 +1,292 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from issues.hyperloglog import HyperLogLog
+from issues.middleware import deferred_queries
+from issues.models import Comment, Issue, Project, VisitFlushRequest, VisitorSketch
+
+logger = logging.getLogger(__name__)
+
+# (model, counter field, counted model, foreign key to model)
+STORED_COUNTERS = [
+    (Project, 'issue_count', Issue, 'project'),
+    (Issue, 'comment_count', Comment, 'issue'),
+]
+
+
+def hotness_weight(when):
+    # A visit counts 2^((t - epoch) / half life), so each visit's share of the
+    # score halves every half life relative to newer ones. The score only ever
+    # grows, which lets it be kept with additive F() updates and indexed.
+    epoch = getattr(settings, 'HOTNESS_EPOCH', 0)
+    half_life = getattr(settings, 'HOTNESS_HALF_LIFE', 3 * 24 * 60 * 60)
+    return 2 ** ((when.timestamp() - epoch) / half_life)
+
+
+def rescale_hotness(previous_epoch):
+    # Scores built against `previous_epoch` are moved onto HOTNESS_EPOCH.
+    # Every score is multiplied by the same factor, so the ranking stays
+    # the same and visits keep their relative weight.
+    epoch = getattr(settings, 'HOTNESS_EPOCH', 0)
+    half_life = getattr(settings, 'HOTNESS_HALF_LIFE', 3 * 24 * 60 * 60)
+    factor = 2 ** ((previous_epoch - epoch) / half_life)
+    rescaled = {}
+    with transaction.atomic():
+        for model in (Project, Issue):
+            rescaled[model.__name__] = model.objects.exclude(hotness=0).update(hotness=F('hotness') * factor)
+    return rescaled
+
+
+def visitor_id(request):
+    # one visitor is an account, else a session, else an address and browser;
+    # only hashes of these end up in the sketches
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    return 'client:{}|{}'.format(request.META.get('REMOTE_ADDR', ''), request.META.get('HTTP_USER_AGENT', ''))
+
+
+def unique_visitors(instance, days=30):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    sketches = VisitorSketch.objects.filter(**{instance._meta.model_name: instance}, day__gte=since)
+    sketch = HyperLogLog()
+    for registers in sketches.values_list('registers', flat=True):
+        sketch.merge(HyperLogLog.from_bytes(registers))
+    return len(sketch)
+
+
+class VisitCounter:
+    # Visits are buffered in memory per worker process and written back in
+    # batches as F() updates, so a page view never rewrites the whole row.
+    # Distinct visitors are collected in a HyperLogLog sketch per row and day
+    # and merged into the stored sketches on flush, the popular ranking only
+    # grows with new distinct visitors.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # one flush at a time, the timer and a request could otherwise
+        # merge into the same stored sketches at once
+        self.write_lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+        self.flushed_at = timezone.now()
+        self.timer = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VISIT_COUNTER_FLUSH_INTERVAL', 30)
+
+    @property
+    def request_poll_interval(self):
+        return getattr(settings, 'VISIT_COUNTER_REQUEST_POLL_INTERVAL', 5)
+
+    @property
+    def timer_interval(self):
+        # the timer checks often enough to notice a requested flush
+        return max(min(self.flush_interval, self.request_poll_interval), 1)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'VISIT_COUNTER_MAX_PENDING', 1000)
+
+    def record(self, model, pk, visitor=None):
+        now = timezone.now()
+        with self.lock:
+            count, _, sketches = self.pending.get((model, pk), (0, None, {}))
+            if visitor is not None:
+                sketches.setdefault(timezone.localdate(now), HyperLogLog()).add(visitor)
+            self.pending[(model, pk)] = (count + 1, now, sketches)
+            due = (
+                time.monotonic() - self.last_flush >= self.flush_interval
+                or len(self.pending) >= self.max_pending
+            )
+            if not due and (self.timer is None or not self.timer.is_alive()):
+                self.start_timer()
+        if due:
+            self.flush_logged()
+
+    def start_timer(self):
+        # flushes the visits of a worker that stopped getting requests, a
+        # forked worker starts its own as the parent's thread is not copied
+        self.timer = threading.Thread(target=self.flush_periodically, name='visit-counter-flush', daemon=True)
+        self.timer.start()
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(self.timer_interval)
+            try:
+                self.flush_if_due()
+            finally:
+                connection.close()
+
+    def flush_if_due(self):
+        with self.lock:
+            pending = bool(self.pending)
+            due = pending and time.monotonic() - self.last_flush >= self.flush_interval
+            flushed_at = self.flushed_at
+        if pending and not due:
+            due = self.flush_requested_since(flushed_at)
+        if due:
+            return self.flush_logged()
+        return 0
+
+    def flush_requested_since(self, flushed_at):
+        # the flush_visits command runs in its own process, it leaves a
+        # stamp that the timer of every worker checks
+        try:
+            return VisitFlushRequest.objects.filter(requested_at__gt=flushed_at).exists()
+        except DatabaseError:
+            logger.exception("Could not check for requested visit count flushes")
+            return False
+
+    def flush_logged(self):
+        # a failed flush keeps the counts for the next one instead of
+        # failing the request that triggered it
+        try:
+            return self.flush()
+        except DatabaseError:
+            logger.exception("Could not flush buffered visit counts")
+            return 0
+
+    def pending_count(self, model, pk):
+        with self.lock:
+            count, _, _ = self.pending.get((model, pk), (0, None, {}))
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+            self.last_flush = time.monotonic()
+            self.flushed_at = timezone.now()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+            self.flushed_at = timezone.now()
+        if not pending:
+            return 0
+
+        try:
+            with self.write_lock, deferred_queries():
+                self.write(pending)
+        except Exception:
+            self.restore(pending)
+            raise
+        return len(pending)
+
+    def restore(self, pending):
+        # puts the counts of a failed flush back, merged with the visits
+        # recorded meanwhile
+        with self.lock:
+            for key, (count, last_visit, sketches) in pending.items():
+                newer_count, newer_visit, newer_sketches = self.pending.get(key, (0, last_visit, {}))
+                for day, sketch in newer_sketches.items():
+                    sketches[day] = sketches[day].merge(sketch) if day in sketches else sketch
+                self.pending[key] = (count + newer_count, max(last_visit, newer_visit), sketches)
+
+    def write(self, pending):
+        try:
+            weight = hotness_weight(timezone.now())
+        except OverflowError:
+            # the visits are still counted, only the scores stop growing
+            logger.error("Hotness weights overflow, move HOTNESS_EPOCH forward and run rescale_hotness")
+            weight = None
+        with transaction.atomic():
+            new_visitors = self.merge_sketches(pending)
+
+            # rows that received the same number of visits and new visitors
+            # share one UPDATE
+            batches = defaultdict(list)
+            for (model, pk), (count, last_visit, _) in pending.items():
+                batches[(model, count, new_visitors[(model, pk)])].append((pk, last_visit))
+
+            for (model, count, visitors), rows in batches.items():
+                updates = {'visits': F('visits') + count}
+                if visitors and weight is not None:
+                    updates['hotness'] = F('hotness') + visitors * weight
+                if any(field.name == 'last_visit' for field in model._meta.fields):
+                    updates['last_visit'] = max(last_visit for _, last_visit in rows)
+                model.objects.filter(pk__in=[pk for pk, _ in rows]).update(**updates)
+
+    def merge_sketches(self, pending):
+        # returns the estimated number of visitors each row had not seen yet
+        by_day = defaultdict(dict)
+        for (model, pk), (_, _, sketches) in pending.items():
+            for day, sketch in sketches.items():
+                by_day[(model, day)][pk] = sketch
+
+        new_visitors = defaultdict(int)
+        for (model, day), sketches in by_day.items():
+            field = model._meta.model_name
+            # locked so another worker's flush can not overwrite the merge
+            rows = VisitorSketch.objects.select_for_update().filter(day=day, **{f'{field}__in': list(sketches)})
+            stored = {getattr(row, f'{field}_id'): row for row in rows}
+            missing = [pk for pk in sketches if pk not in stored]
+            existing = set(model.objects.filter(pk__in=missing).values_list('pk', flat=True)) if missing else set()
+
+            changed, created = [], []
+            for pk, sketch in sketches.items():
+                row = stored.get(pk)
+                if row is not None:
+                    before = HyperLogLog.from_bytes(row.registers)
+                    merged = HyperLogLog.from_bytes(row.registers).merge(sketch)
+                    # the estimate can dip when the sketch switches method,
+                    # a visit never lowers the score
+                    new_visitors[(model, pk)] += max(0, len(merged) - len(before))
+                    row.registers = merged.to_bytes()
+                    changed.append(row)
+                elif pk in existing:
+                    new_visitors[(model, pk)] += len(sketch)
+                    created.append(VisitorSketch(day=day, registers=sketch.to_bytes(), **{f'{field}_id': pk}))
+            VisitorSketch.objects.bulk_update(changed, ['registers'])
+            # a sketch another process created meanwhile keeps its own visitors
+            VisitorSketch.objects.bulk_create(created, ignore_conflicts=True)
+        return new_visitors
+
+
+visit_counter = VisitCounter()
+
+
+def request_visit_flush():
+    VisitFlushRequest.objects.update_or_create(pk=1, defaults={'requested_at': timezone.now()})
+
+
+@atexit.register
+def flush_on_exit():
+    visit_counter.flush_logged()
+
+
+def counted(related, foreign_key):
+    counts = (
+        related.objects.filter(**{foreign_key: OuterRef('pk')})
+        .order_by()
+        .values(foreign_key)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def repair_counters():
+    # recounts every stored counter in one UPDATE per counter, only the rows
+    # that drifted are written
+    repaired = {}
+    with transaction.atomic():
+        for model, field, related, foreign_key in STORED_COUNTERS:
+            expected = counted(related, foreign_key)
+            repaired[f'{model.__name__}.{field}'] = (
+                model.objects.exclude(**{field: expected}).update(**{field: expected})
+            )
+    return repaired
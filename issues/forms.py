@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
+from issues.identity import IdentityMap
 from issues.models import Issue, Project, Comment
 
 User = get_user_model()
@@ -145,9 +146,15 @@ class AddUserForm(forms.Form):
         ),
     )
 
+    def __init__(self, *args, identities=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.identities = identities or IdentityMap()
+
     def clean_username(self):
         username = self.cleaned_data['username']
-        if not User.objects.filter(name=username).exists():
+        try:
+            self.identities.get_by(User, name=username)
+        except User.DoesNotExist:
             raise forms.ValidationError("This username does not exist")
         return username
 
@@ -173,6 +180,9 @@ class CommentForm(forms.ModelForm):
         self.user = user
         self.issue = issue
         self.parent = parent
+        # set before validation, the model checks how deep the reply is
+        if parent is not None:
+            self.instance.parent_comment = parent
         self.fields['text'].label = ''
 
     def save(self, commit=True):
@@ -0,0 +1,76 @@
+from django.db import models
+
+
+class IdentityMap:
+    # Model instances loaded during one request, by model and pk. Each row is
+    # fetched at most once, and foreign keys pointing at loaded rows are
+    # filled in from the map instead of the database.
+
+    def __init__(self):
+        self.instances = {}
+
+    def key(self, model, pk):
+        model = model._meta.concrete_model
+        return (model, model._meta.pk.to_python(pk))
+
+    def add(self, instance, _seen=None):
+        key = self.key(instance._meta.concrete_model, instance.pk)
+        instance = self.instances.setdefault(key, instance)
+        # rows that came along through select_related are known too, and
+        # copies of rows that were already loaded are swapped for the loaded ones
+        seen = _seen or set()
+        seen.add(id(instance))
+        fields_cache = instance._state.fields_cache
+        for name, related in list(fields_cache.items()):
+            if isinstance(related, models.Model) and id(related) not in seen:
+                fields_cache[name] = self.add(related, seen)
+        return instance
+
+    def get(self, model, pk, queryset=None):
+        key = self.key(model, pk)
+        if key not in self.instances:
+            queryset = model._default_manager.all() if queryset is None else queryset
+            self.add(queryset.get(pk=pk))
+        return self.attach(self.instances[key])
+
+    def get_by(self, model, **lookup):
+        # a row by another unique field, e.g. a user by name
+        [(field, value)] = lookup.items()
+        model = model._meta.concrete_model
+        for (loaded_model, pk), instance in self.instances.items():
+            if loaded_model is model and getattr(instance, field) == value:
+                return self.attach(instance)
+        return self.attach(self.add(model._default_manager.get(**lookup)))
+
+    def get_many(self, model, pks, queryset=None):
+        keys = {self.key(model, pk) for pk in pks}
+        missing = [pk for _, pk in keys if (model._meta.concrete_model, pk) not in self.instances]
+        if missing:
+            queryset = model._default_manager.all() if queryset is None else queryset
+            for instance in queryset.filter(pk__in=missing):
+                self.add(instance)
+        found = {}
+        for key in keys:
+            if key in self.instances:
+                found[key[1]] = self.attach(self.instances[key])
+        return found
+
+    def attach(self, instance):
+        deferred = instance.get_deferred_fields()
+        for field in instance._meta.concrete_fields:
+            if not field.many_to_one or field.attname in deferred or field.is_cached(instance):
+                continue
+            value = getattr(instance, field.attname)
+            if value is not None:
+                related = self.instances.get(self.key(field.related_model, value))
+                if related is not None:
+                    field.set_cached_value(instance, related)
+        return instance
+
+
+def identity_map(request):
+    if not hasattr(request, 'identity_map'):
+        request.identity_map = IdentityMap()
+        if request.user.is_authenticated:
+            request.identity_map.add(request.user)
+    return request.identity_map
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from issues.archive import archive_closed_issues, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move issues closed longer than ARCHIVE_CLOSED_ISSUES_AFTER days into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="archive issues closed more than this many days ago")
+        parser.add_argument('--batch-size', type=int, help="issues moved per transaction")
+
+    def handle(self, *args, **options):
+        archived = archive_closed_issues(archive_cutoff(options['days']), options['batch_size'])
+        self.stdout.write(f"Archived {archived} issues")
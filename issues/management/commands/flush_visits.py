@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from issues.counters import request_visit_flush, visit_counter
+
+
+class Command(BaseCommand):
+    help = "Ask every worker to write its buffered visit counts to the database"
+
+    def handle(self, *args, **options):
+        request_visit_flush()
+        visit_counter.flush()
+        self.stdout.write(
+            f"Asked the workers to flush their visit counts within {visit_counter.timer_interval} seconds"
+        )
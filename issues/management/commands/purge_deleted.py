@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from issues.purge import purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Delete the projects and issues marked for deletion, PURGE_BATCH_SIZE rows per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="rows deleted per transaction")
+
+    def handle(self, *args, **options):
+        purged = purge_deleted(options['batch_size'])
+        self.stdout.write(f"Purged {purged} rows")
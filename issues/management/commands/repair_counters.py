@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from issues import tasks
+from issues.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = "Recount the stored issue and comment counters and fix any that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true', help="leave the recount to the run_tasks worker")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            tasks.repair_counters.enqueue()
+            self.stdout.write("Queued the recount")
+            return
+        for counter, repaired in repair_counters().items():
+            self.stdout.write(f"{counter}: repaired {repaired} rows")
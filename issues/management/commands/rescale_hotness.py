@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from issues.counters import rescale_hotness
+
+
+class Command(BaseCommand):
+    help = "Rescale the stored hotness scores after HOTNESS_EPOCH was moved forward"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--previous-epoch', type=float, required=True, help="the HOTNESS_EPOCH the scores were built with")
+
+    def handle(self, *args, **options):
+        for model, rescaled in rescale_hotness(options['previous_epoch']).items():
+            self.stdout.write(f"{model}: rescaled {rescaled} rows")
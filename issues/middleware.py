@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(view_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+deferred = threading.local()
+
+
+@contextmanager
+def deferred_queries():
+    # Work a deployment does outside the request, like flushing buffered
+    # visits or running tasks, can run inline in development. Its queries
+    # are counted apart and left out of the view's budget.
+    depth = getattr(deferred, 'depth', 0)
+    deferred.depth = depth + 1
+    try:
+        yield
+    finally:
+        deferred.depth = depth
+
+
+class QueryCounter:
+    # execute wrapper that counts the queries run through it and their time
+
+    def __init__(self):
+        self.count = 0
+        self.deferred = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if getattr(deferred, 'depth', 0):
+                self.deferred += 1
+            else:
+                self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryBudgetMiddleware:
+    # Logs the number of queries and the SQL time of every request, and fails
+    # requests that go over their view's entry in QUERY_BUDGETS while DEBUG is on.
+
+    def __init__(self, get_response):
+        enabled = getattr(settings, 'QUERY_BUDGET_MIDDLEWARE', None)
+        if not (settings.DEBUG if enabled is None else enabled):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = query_budget(view_name)
+        over_budget = budget is not None and counter.count > budget
+
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            "%s %s: %d queries in %.1fms (budget %s, %d deferred)",
+            request.method, view_name, counter.count, counter.duration * 1000, budget, counter.deferred,
+        )
+        if over_budget and settings.DEBUG:
+            raise QueryBudgetExceeded(
+                f"{view_name} ran {counter.count} queries, its budget is {budget}"
+            )
+        return response
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+PATH_STEP_WIDTH = 10
+PATH_MAX_LENGTH = 1024
+
+
+def backfill_comment_paths(apps, schema_editor):
+    Comment = apps.get_model('issues', 'Comment')
+    parents = dict(Comment.objects.values_list('id', 'parent_comment_id'))
+    paths = {}
+
+    # walks up to the nearest ancestor with a path and builds the paths on
+    # the way back down, so deep threads do not recurse
+    for comment_id in sorted(parents):
+        chain = []
+        current = comment_id
+        while current and current not in paths:
+            chain.append(current)
+            current = parents[current]
+        path = paths[current] if current else ''
+        for ancestor_id in reversed(chain):
+            path = f'{path}{ancestor_id:0{PATH_STEP_WIDTH}d}/'
+            if len(path) > PATH_MAX_LENGTH:
+                raise ValueError(f"Comment {ancestor_id} is nested too deep for a {PATH_MAX_LENGTH} character path")
+            paths[ancestor_id] = path
+
+    comments = [Comment(id=comment_id, path=path) for comment_id, path in sorted(paths.items())]
+    Comment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0013_alter_issue_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=PATH_MAX_LENGTH),
+        ),
+        migrations.RunPython(backfill_comment_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'path'], name='comment_issue_path_idx'),
+        ),
+    ]
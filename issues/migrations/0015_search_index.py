@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+SEARCH_TABLE = 'issues_search_index'
+KINDS = {'project': 1, 'issue': 2, 'comment': 3}
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is an optional SQLite extension, without it the search view falls
+    # back to icontains lookups
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "kind UNINDEXED, object_id UNINDEXED, issue_id UNINDEXED, "
+                "title, body, prefix='2 3')"
+            )
+        except OperationalError:
+            return
+        # rank by bm25 with title matches weighted above body matches
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(0, 0, 0, 10.0, 1.0)')"
+        )
+
+        Project = apps.get_model('issues', 'Project')
+        Issue = apps.get_model('issues', 'Issue')
+        Comment = apps.get_model('issues', 'Comment')
+        rows = []
+        for pk, title, summary in Project.objects.values_list('id', 'title', 'summary').iterator():
+            rows.append((pk * len(KINDS) + KINDS['project'], 'project', pk, None, title, summary))
+        for pk, title, summary in Issue.objects.values_list('id', 'title', 'summary').iterator():
+            rows.append((pk * len(KINDS) + KINDS['issue'], 'issue', pk, pk, title, summary))
+        for pk, issue_id, text in Comment.objects.values_list('id', 'issue_id', 'text').iterator():
+            rows.append((pk * len(KINDS) + KINDS['comment'], 'comment', pk, issue_id, '', text))
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, issue_id, title, body) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0014_comment_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
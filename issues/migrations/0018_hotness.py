@@ -0,0 +1,48 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_hotness(apps, schema_editor):
+    # the past visits are only known as a total, they are counted as if they
+    # all happened at the last visit (issues) or last change (projects)
+    epoch = getattr(settings, 'HOTNESS_EPOCH', 0)
+    half_life = getattr(settings, 'HOTNESS_HALF_LIFE', 3 * 24 * 60 * 60)
+    for model_name, seen_field in [('Issue', 'last_visit'), ('Project', 'modified_on')]:
+        model = apps.get_model('issues', model_name)
+        rows = []
+        for row in model.objects.filter(visits__gt=0).only('visits', seen_field).iterator():
+            seen = getattr(row, seen_field)
+            row.hotness = row.visits * 2 ** ((seen.timestamp() - epoch) / half_life)
+            rows.append(row)
+        model.objects.bulk_update(rows, ['hotness'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0017_stored_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='hotness',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='hotness',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_hotness, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['-hotness', '-visits', '-created_on'], name='issue_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-hotness', '-visits', '-created_on'], name='project_hot_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0019_visitor_sketch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'parent_comment', 'created_at'], name='comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+STATUSES = [('Open', '1'), ('Closed', '2')]
+
+
+def statuses_to_numbers(apps, schema_editor):
+    # the numbers are written as text first, the column change casts them
+    Issue = apps.get_model('issues', 'Issue')
+    for label, number in STATUSES:
+        Issue.objects.filter(issue_status=label).update(issue_status=number)
+
+
+def numbers_to_statuses(apps, schema_editor):
+    Issue = apps.get_model('issues', 'Issue')
+    for label, number in STATUSES:
+        Issue.objects.filter(issue_status=number).update(issue_status=label)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0020_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(statuses_to_numbers, numbers_to_statuses),
+        migrations.AlterField(
+            model_name='issue',
+            name='issue_status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Open'), (2, 'Closed')], default=1),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def backfill_closed_on(apps, schema_editor):
+    # the close date was not stored, the last change is the closest to it
+    Issue = apps.get_model('issues', 'Issue')
+    Issue.objects.filter(issue_status=2).update(closed_on=F('modified_on'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('issues', '0021_issue_status_integer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('depth', models.IntegerField(default=0)),
+                ('path', models.CharField(default='', max_length=1024)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssue',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=64)),
+                ('summary', models.TextField()),
+                ('issue_status', models.PositiveSmallIntegerField(choices=[(1, 'Open'), (2, 'Closed')], default=2)),
+                ('priority', models.IntegerField(choices=[(3, 'High'), (2, 'Medium'), (1, 'Low')], default=1)),
+                ('created_on', models.DateTimeField()),
+                ('modified_on', models.DateTimeField()),
+                ('visits', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('closed_on', models.DateTimeField(blank=True, default=None, null=True)),
+                ('archived_on', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='closed_on',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(backfill_closed_on, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['issue_status', 'closed_on'], name='issue_closed_on_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='assigned_users',
+            field=models.ManyToManyField(related_name='archived_issues_assigned', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='closed_by',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_closed_issues', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issue_created_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='modified_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issue_modified_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issues', to='issues.project'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='issue',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='issues.archivedissue'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='parent_comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='issues.archivedcomment'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['issue', 'path'], name='archived_comment_path_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0022_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='pending_delete',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='pending_delete',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['pending_delete'], name='issue_pending_delete_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['pending_delete'], name='project_pending_delete_idx'),
+        ),
+    ]
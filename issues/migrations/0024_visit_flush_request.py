@@ -0,0 +1,20 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0023_pending_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitFlushRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,9 +1,38 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class Project(models.Model):
+
+class CounterFieldsMixin:
+    # Counter columns and flags are only changed with update() calls. A full
+    # save of an instance loaded earlier would write a stale value back, so
+    # updates leave them out unless they are asked for by name.
+    counter_fields = ()
+    flag_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in (*self.counter_fields, *self.flag_fields)
+            ]
+        super().save(*args, **kwargs)
+
+
+class PendingDeleteManager(models.Manager):
+    # Rows marked for deletion are gone for the rest of the app right away,
+    # the purge_deleted command removes them with their cascade in batches.
+    # `all_objects` still sees them.
+
+    def get_queryset(self):
+        return super().get_queryset().filter(pending_delete=False)
+
+
+class Project(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=64)
     summary = models.CharField(max_length=1024)
     created_on = models.DateTimeField(auto_now_add=True)
@@ -11,72 +40,256 @@ class Project(models.Model):
     modified_on = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='project_modified_by')
     visits = models.IntegerField(default=0)
+    hotness = models.FloatField(default=0, editable=False)
+    issue_count = models.IntegerField(default=0, editable=False)
     assigned_users = models.ManyToManyField(User, related_name='projects_assigned')
+    pending_delete = models.BooleanField(default=False, editable=False)
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('-visits', '-created_on', 'title')
+        indexes = [
+            models.Index(fields=['-visits', '-created_on', 'title'], name='project_popular_idx'),
+            models.Index(fields=['-created_on'], name='project_recent_idx'),
+            models.Index(fields=['-hotness', '-visits', '-created_on'], name='project_hot_idx'),
+            # counts the live rows and finds the ones left to purge
+            models.Index(fields=['pending_delete'], name='project_pending_delete_idx'),
+        ]
+
+    counter_fields = ('issue_count', 'visits', 'hotness')
+    flag_fields = ('pending_delete',)
 
     def __str__(self):
         return self.title
 
-    @property
-    def issue_count(self):
-        return self.issue_list.count()
-
 
-class Issue(models.Model):
+class Issue(CounterFieldsMixin, models.Model):
     PRIORITY_CHOICES = [
         (3, 'High'),
         (2, 'Medium'),
         (1, 'Low'),
     ]
 
+    OPEN = 1
+    CLOSED = 2
     STATUS_CHOICES = [
-        ('Open', 'Open'),
-        ('Closed', 'Closed')
+        (OPEN, 'Open'),
+        (CLOSED, 'Closed')
     ]
 
     title = models.CharField(max_length=64)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='issue_list')
     summary = models.TextField()
-    issue_status = models.CharField(max_length=6, choices=STATUS_CHOICES, default='Open')
+    issue_status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=OPEN)
     priority = models.IntegerField(choices=PRIORITY_CHOICES, default=1)
     created_on = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='issue_created_by')
     modified_on = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='issue_modified_by')
     visits = models.IntegerField(default=0)
+    hotness = models.FloatField(default=0, editable=False)
     last_visit = models.DateTimeField(auto_now=True)
+    comment_count = models.IntegerField(default=0, editable=False)
     assigned_users = models.ManyToManyField(User, related_name='issues_assigned')
     closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='closed_issues', default=None, null=True, blank=True)
+    closed_on = models.DateTimeField(default=None, null=True, blank=True)
+    pending_delete = models.BooleanField(default=False, editable=False)
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('-visits', '-created_on', 'issue_status', 'priority')
+        # one index per list query: the default and popular orderings, the
+        # open/closed filters and the per project filters of ProjectDetailView
+        indexes = [
+            models.Index(fields=['-visits', '-created_on', 'issue_status', 'priority'], name='issue_popular_idx'),
+            models.Index(fields=['-created_on'], name='issue_recent_idx'),
+            models.Index(fields=['issue_status', '-visits', '-created_on', 'priority'], name='issue_status_popular_idx'),
+            models.Index(fields=['project', '-created_on'], name='issue_project_recent_idx'),
+            models.Index(fields=['project', 'issue_status', '-created_on'], name='issue_project_status_idx'),
+            models.Index(fields=['project', 'issue_status', '-priority'], name='issue_project_priority_idx'),
+            models.Index(fields=['-hotness', '-visits', '-created_on'], name='issue_hot_idx'),
+            models.Index(fields=['issue_status', 'closed_on'], name='issue_closed_on_idx'),
+            models.Index(fields=['pending_delete'], name='issue_pending_delete_idx'),
+        ]
+
+    counter_fields = ('comment_count', 'visits', 'hotness', 'last_visit')
+    flag_fields = ('pending_delete',)
 
     def __str__(self):
         return self.title
 
     @property
-    def comment_count(self):
-        return self.comments.count()
+    def is_open(self):
+        return self.issue_status == self.OPEN
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Project.objects.filter(pk=self.project_id).update(issue_count=F('issue_count') + 1)
+        if adding and Issue.project.is_cached(self):
+            self.project.issue_count += 1
+
+
+def path_range(path, include_root=False):
+    # every path below `path` starts with it, and '0' is the first character
+    # sorting after the '/' separator
+    lower = 'path__gte' if include_root else 'path__gt'
+    return {lower: path, 'path__lt': path[:-1] + '0'}
 
 
 class Comment(models.Model):
+    PATH_STEP_WIDTH = 10
+    PATH_MAX_LENGTH = 1024
+    # every level adds the padded pk and a slash to the path
+    MAX_DEPTH = PATH_MAX_LENGTH // (PATH_STEP_WIDTH + 1) - 1
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField()
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='comments')
     parent_comment = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     depth = models.IntegerField(default=0)
+    path = models.CharField(max_length=PATH_MAX_LENGTH, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', 'path'], name='comment_issue_path_idx'),
+            models.Index(fields=['issue', 'parent_comment', 'created_at'], name='comment_thread_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
+    def clean(self):
+        self.check_depth()
+
+    def check_depth(self):
+        # a reply has to fit its path, which is one step longer than its parent's
+        if not self.parent_comment_id:
+            return
+        if len(self.parent_comment.path) + self.PATH_STEP_WIDTH + 1 > self.PATH_MAX_LENGTH:
+            raise ValidationError(f"Replies can not be nested more than {self.MAX_DEPTH} levels deep")
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            self.check_depth()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Issue.objects.filter(pk=self.issue_id).update(comment_count=F('comment_count') + 1)
+            # the path is built from the pk, so it can only be set once the row exists
+            old_path, new_path = self.path, self.build_path()
+            if old_path != new_path:
+                Comment.objects.filter(pk=self.pk).update(path=new_path)
+                if old_path:
+                    Comment.objects.filter(issue_id=self.issue_id, **path_range(old_path)).update(
+                        path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+                    )
+                self.path = new_path
+        if adding and Comment.issue.is_cached(self):
+            self.issue.comment_count += 1
+
+    def delete(self, *args, **kwargs):
+        if self.path:
+            return self.subtree().delete()
+        return super().delete(*args, **kwargs)
+
+    def build_path(self):
+        parent_path = self.parent_comment.path if self.parent_comment_id else ''
+        return f'{parent_path}{self.pk:0{self.PATH_STEP_WIDTH}d}/'
+
+    def subtree(self):
+        return Comment.objects.filter(issue_id=self.issue_id, **path_range(self.path, include_root=True))
+
+    def descendants(self):
+        return Comment.objects.filter(issue_id=self.issue_id, **path_range(self.path))
+
     @property
     def reply_count(self):
-        total = self.replies.count()
-        for reply in self.replies.all():
-            if reply:
-                total += reply.reply_count
-        return total
+        return self.descendants().count()
+
+
+class ArchivedIssueManager(models.Manager):
+    # archived issues go with their project when it is marked for deletion
+
+    def get_queryset(self):
+        return super().get_queryset().filter(project__pending_delete=False)
+
+
+class ArchivedIssue(models.Model):
+    # A closed issue moved out of issues_issue by the archive_issues command,
+    # keeping its id so its links and search entries still work. Archived
+    # issues are read only.
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=64)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='archived_issues')
+    summary = models.TextField()
+    issue_status = models.PositiveSmallIntegerField(choices=Issue.STATUS_CHOICES, default=Issue.CLOSED)
+    priority = models.IntegerField(choices=Issue.PRIORITY_CHOICES, default=1)
+    created_on = models.DateTimeField()
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_issue_created_by')
+    modified_on = models.DateTimeField()
+    modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_issue_modified_by')
+    visits = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    assigned_users = models.ManyToManyField(User, related_name='archived_issues_assigned')
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='archived_closed_issues', default=None, null=True, blank=True)
+    closed_on = models.DateTimeField(default=None, null=True, blank=True)
+    archived_on = models.DateTimeField(auto_now_add=True)
+
+    objects = ArchivedIssueManager()
+    all_objects = models.Manager()
+
+    is_open = False
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    # the comments of an archived issue, with their ids and paths
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_comments')
+    text = models.TextField()
+    issue = models.ForeignKey(ArchivedIssue, on_delete=models.CASCADE, related_name='comments')
+    parent_comment = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    depth = models.IntegerField(default=0)
+    path = models.CharField(max_length=1024, default='')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', 'path'], name='archived_comment_path_idx'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class VisitorSketch(models.Model):
+    # one HyperLogLog sketch of the distinct visitors of an issue or a project per day
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, null=True, blank=True, related_name='visitor_sketches')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='visitor_sketches')
+    day = models.DateField()
+    registers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['issue', 'day'], name='visitor_sketch_issue_day'),
+            models.UniqueConstraint(fields=['project', 'day'], name='visitor_sketch_project_day'),
+        ]
+
+
+class VisitFlushRequest(models.Model):
+    # a single row stamped by the flush_visits command, every worker flushes
+    # its buffered visits once it sees a stamp newer than its last flush
+    requested_at = models.DateTimeField()
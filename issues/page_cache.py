@@ -0,0 +1,86 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from issues.counters import visit_counter, visitor_id
+
+TAG_PREFIX = 'page-tag:'
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 0)
+
+
+def invalidate_tags(*tags):
+    # every cached page is keyed by the versions of its tags, a new version
+    # makes all the pages carrying that tag unreachable
+    cache.set_many({TAG_PREFIX + tag: uuid.uuid4().hex for tag in tags}, None)
+
+
+def tag_versions(tags):
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def page_key(request, tags):
+    # the filter term is part of the path, the page and cursor parameters are
+    # the only ones the cached views read
+    parts = [
+        request.path,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', '') if 'cursor' in request.GET else '-',
+        *tag_versions(tags),
+    ]
+    return 'page:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def cache_anonymous_page(tags, visit=None):
+    # Serves GET requests from anonymous visitors out of the cache. `tags`
+    # are formatted with the URL kwargs, e.g. 'issue:{issue_id}', and
+    # `visit` is a (model, URL kwarg) pair whose visit is still counted
+    # when the page comes from the cache.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = page_cache_timeout()
+            if not timeout or request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            key = page_key(request, [tag.format(**kwargs) for tag in tags])
+            response = cache.get(key)
+            if response is not None:
+                if visit:
+                    model, kwarg = visit
+                    visit_counter.record(model, model._meta.pk.to_python(kwargs[kwarg]), visitor_id(request))
+                return response
+
+            response = view(request, *args, **kwargs)
+
+            def store(response):
+                if is_cacheable(request, response):
+                    cache.set(key, response, timeout)
+
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
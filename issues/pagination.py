@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor('next', self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor('previous', self.object_list[0])
+
+
+class KeysetPaginator:
+    # Pages through a queryset by the values of its ordering columns instead
+    # of an OFFSET, so every page costs the same. The ordering fields must be
+    # non-null, the pk is appended to make the order unique.
+
+    def __init__(self, queryset, per_page):
+        self.per_page = per_page
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('pk')
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.fields = [
+            queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+            for name, _ in self.ordering
+        ]
+        self.queryset = queryset.order_by(*ordering)
+
+    def encode_cursor(self, direction, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        data = json.dumps([direction, values])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in ('next', 'previous') or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+        # the ordering fields are non-null, and a null can not be compared
+        if None in values:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def after(self, values, backwards):
+        # (a, b, c) after (x, y, z) expands to a > x OR (a = x AND b > y) OR ...
+        # the extra a >= x lets the database seek on the leading column
+        def lookup(descending, strict):
+            greater = descending == backwards
+            return ('gt' if greater else 'lt') if strict else ('gte' if greater else 'lte')
+
+        first_name, first_descending = self.ordering[0]
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            condition |= equal & Q(**{f'{name}__{lookup(descending, True)}': value})
+            equal &= Q(**{name: value})
+        return Q(**{f'{first_name}__{lookup(first_descending, False)}': values[0]}) & condition
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        direction, values = self.decode_cursor(cursor)
+        if direction == 'next':
+            rows = list(self.queryset.filter(self.after(values, backwards=False))[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        queryset = self.queryset.filter(self.after(values, backwards=True)).reverse()
+        rows = list(queryset[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page][::-1], self, True, len(rows) > self.per_page)
+
+    def approximate_count(self, timeout=60):
+        # an exact COUNT(*) on every page is what keyset pagination avoids,
+        # so the total is shared between requests for a short while
+        sql, params = self.queryset.query.sql_with_params()
+        key = 'keyset-count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        return cache.get_or_set(key, self.queryset.count, timeout)
+
+
+class PaginationMixin:
+    # Numbered pages by default, cursor pages when KEYSET_PAGINATION is set
+    # or the request already carries a cursor.
+    page_range_displayed = 8
+    keyset_approximate_total = True
+
+    def keyset_enabled(self):
+        return getattr(settings, 'KEYSET_PAGINATION', False) or 'cursor' in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_enabled():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = context['paginator']
+        page = context['page_obj']
+
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        context['page_query'] = query.urlencode() + '&' if query else ''
+
+        if isinstance(paginator, KeysetPaginator):
+            context['cursor_pagination'] = True
+            if self.keyset_approximate_total:
+                context['approximate_total'] = paginator.approximate_count()
+            return context
+
+        context['current_page'] = page.number
+        context['total_pages'] = paginator.num_pages
+
+        start_page = max(page.number - self.page_range_displayed//2, 1)
+        end_page = min(page.number + self.page_range_displayed//2, paginator.num_pages)
+        context['page_range'] = range(start_page, end_page+1)
+        return context
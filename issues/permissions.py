@@ -0,0 +1,47 @@
+from django.db.models import CharField, Value
+
+from issues.models import Issue, Project
+
+
+class Permissions:
+    # The ids of the issues and projects a user is assigned to, loaded once
+    # so every membership check is a set lookup.
+
+    def __init__(self, issue_ids=(), project_ids=()):
+        self.issue_ids = frozenset(issue_ids)
+        self.project_ids = frozenset(project_ids)
+
+    def is_assigned_to_issue(self, issue):
+        return getattr(issue, 'pk', issue) in self.issue_ids
+
+    def is_assigned_to_project(self, project):
+        return getattr(project, 'pk', project) in self.project_ids
+
+
+def load_permissions(user):
+    if not user.is_authenticated:
+        return Permissions()
+    # both assignment tables are read in one query
+    issues = (
+        Issue.assigned_users.through.objects.filter(user=user)
+        .annotate(kind=Value('issue', CharField()))
+        .values_list('kind', 'issue_id')
+    )
+    projects = (
+        Project.assigned_users.through.objects.filter(user=user)
+        .annotate(kind=Value('project', CharField()))
+        .values_list('kind', 'project_id')
+    )
+    ids = {'issue': [], 'project': []}
+    for kind, pk in issues.union(projects, all=True):
+        ids[kind].append(pk)
+    return Permissions(ids['issue'], ids['project'])
+
+
+def get_permissions(request):
+    # Loaded once per request. They are not cached across requests: a
+    # per-process cache could not be invalidated in the other workers, and
+    # a removed assignee would keep access there.
+    if not hasattr(request, 'permissions'):
+        request.permissions = load_permissions(request.user)
+    return request.permissions
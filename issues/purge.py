@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from issues import search
+from issues.models import Issue, Project, Comment, ArchivedIssue, ArchivedComment
+from issues.page_cache import invalidate_tags
+from issues.sidebar import assigned_user_pks, invalidate_sidebars
+
+
+def mark_issue_deleted(issue):
+    # hides the issue at once, the purge removes its comments later
+    with transaction.atomic():
+        if Issue.all_objects.filter(pk=issue.pk, pending_delete=False).update(pending_delete=True):
+            Project.objects.filter(pk=issue.project_id).update(issue_count=F('issue_count') - 1)
+    issue.pending_delete = True
+    # the hidden comments leave the index too, so search counts stay right
+    search.remove_matching_from_index(
+        ('issue', Issue.all_objects.filter(pk=issue.pk)),
+        ('comment', Comment.objects.filter(issue_id=issue.pk)),
+    )
+    invalidate_tags('issues', f'issue:{issue.pk}')
+    users = assigned_user_pks(issue_filter={'issue_id': issue.pk}, project_filter={'project_id': issue.project_id})
+    invalidate_sidebars(users, issue)
+
+
+def mark_project_deleted(project):
+    # the project's issues are hidden with it in the same transaction
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(pending_delete=True)
+        Issue.all_objects.filter(project_id=project.pk).update(pending_delete=True)
+    project.pending_delete = True
+    search.remove_matching_from_index(
+        ('project', Project.all_objects.filter(pk=project.pk)),
+        ('issue', Issue.all_objects.filter(project_id=project.pk)),
+        ('comment', Comment.objects.filter(issue__project_id=project.pk)),
+        ('issue', ArchivedIssue.all_objects.filter(project_id=project.pk)),
+        ('comment', ArchivedComment.objects.filter(issue__project_id=project.pk)),
+    )
+    invalidate_tags('projects', 'issues')
+    users = assigned_user_pks(issue_filter={'issue__project_id': project.pk}, project_filter={'project_id': project.pk})
+    invalidate_sidebars(users, project)
+
+
+def purge_steps(project_id=None, issue_id=None):
+    # What is left of the marked rows, children before their parents so no
+    # delete cascades further than its batch. Replies sort after their
+    # parent's path, so descending paths remove a thread from its leaves.
+    # A project or issue id limits the purge to what its delete marked.
+    comments = Comment.objects.filter(issue__pending_delete=True).order_by('-path')
+    issues = Issue.all_objects.filter(pending_delete=True)
+    if issue_id is not None:
+        return [comments.filter(issue_id=issue_id), issues.filter(pk=issue_id)]
+    archived_comments = ArchivedComment.objects.filter(issue__project__pending_delete=True).order_by('-path')
+    archived_issues = ArchivedIssue.all_objects.filter(project__pending_delete=True)
+    projects = Project.all_objects.filter(pending_delete=True)
+    if project_id is not None:
+        comments = comments.filter(issue__project_id=project_id)
+        issues = issues.filter(project_id=project_id)
+        archived_comments = archived_comments.filter(issue__project_id=project_id)
+        archived_issues = archived_issues.filter(project_id=project_id)
+        projects = projects.filter(pk=project_id)
+    return [comments, issues, archived_comments, archived_issues, projects]
+
+
+def purge_batch(batch_size=None, **scope):
+    # deletes at most `batch_size` rows of one step in one transaction,
+    # returns how many were deleted
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', 500)
+    for queryset in purge_steps(**scope):
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if ids:
+            with transaction.atomic():
+                queryset.model._base_manager.filter(pk__in=ids).delete()
+            return len(ids)
+    return 0
+
+
+def purge_deleted(batch_size=None, **scope):
+    purged = 0
+    while True:
+        deleted = purge_batch(batch_size, **scope)
+        if not deleted:
+            return purged
+        purged += deleted
@@ -0,0 +1,235 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+
+from issues.models import Issue, Project, Comment, ArchivedIssue, ArchivedComment
+
+User = get_user_model()
+
+SEARCH_TABLE = 'issues_search_index'
+TOKEN_RE = re.compile(r'\w+')
+
+# rows are keyed by rowid so updates and deletes never scan the index
+KINDS = {'project': 1, 'issue': 2, 'comment': 3}
+
+
+def index_rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS[kind]
+
+
+def search_index_available():
+    # looked up once per connection, the table only comes and goes with
+    # migrations, which reset the flag
+    available = getattr(connection, 'search_index_available', None)
+    if available is None:
+        available = connection.vendor == 'sqlite' and search_table_exists()
+        connection.search_index_available = available
+    return available
+
+
+def search_table_exists():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+        return cursor.fetchone() is not None
+
+
+def reset_search_index_available(db_connection):
+    db_connection.search_index_available = None
+
+
+def index_entries(instance):
+    # archived issues and comments keep their ids, so they keep their rows
+    if isinstance(instance, Project):
+        return [('project', instance.pk, None, instance.title, instance.summary)]
+    if isinstance(instance, (Issue, ArchivedIssue)):
+        return [('issue', instance.pk, instance.pk, instance.title, instance.summary)]
+    if isinstance(instance, (Comment, ArchivedComment)):
+        return [('comment', instance.pk, instance.issue_id, '', instance.text)]
+    return []
+
+
+def update_index(instance):
+    if not search_index_available():
+        return
+    delete_entries([instance])
+    insert_entries([instance])
+
+
+def add_to_index(instances):
+    if search_index_available():
+        insert_entries(instances)
+
+
+def remove_from_index(instance):
+    if search_index_available():
+        delete_entries([instance])
+
+
+def remove_matching_from_index(*sources):
+    # Removes the entries of every row of the (kind, queryset) pairs in one
+    # DELETE, without loading the rows.
+    if not search_index_available():
+        return
+    selects, params = [], []
+    for kind, queryset in sources:
+        rowids = queryset.order_by().values(rowid=F('pk') * len(KINDS) + KINDS[kind])
+        sql, select_params = rowids.query.sql_with_params()
+        selects.append(sql)
+        params.extend(select_params)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({' UNION ALL '.join(selects)})", params)
+
+
+def insert_entries(instances):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, issue_id, title, body) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                (index_rowid(kind, object_id), kind, object_id, *rest)
+                for instance in instances
+                for kind, object_id, *rest in index_entries(instance)
+            ],
+        )
+
+
+def delete_entries(instances):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(index_rowid(kind, object_id),) for instance in instances for kind, object_id, *_ in index_entries(instance)],
+        )
+
+
+def match_expression(search_query):
+    # every word has to appear, each one matching as a prefix
+    tokens = TOKEN_RE.findall(search_query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class QuerySetSource:
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def count(self):
+        return self.queryset.count()
+
+    def fetch(self, offset, limit):
+        return list(self.queryset[offset:offset + limit])
+
+
+class IndexSource:
+    # ranked matches from the full text index, counted and sliced in SQL. Ids
+    # missing from `queryset` are looked up in `archive`.
+
+    def __init__(self, queryset, kinds, id_column, search_query, archive=None):
+        self.queryset = queryset
+        self.archive = archive
+        self.kinds = kinds
+        self.id_column = id_column
+        self.expression = match_expression(search_query)
+
+    def where(self):
+        placeholders = ', '.join(['%s'] * len(self.kinds))
+        return (
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind IN ({placeholders})",
+            [self.expression, *self.kinds],
+        )
+
+    def count(self):
+        if not self.expression:
+            return 0
+        where, params = self.where()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(DISTINCT {self.id_column}) {where}", params)
+            return cursor.fetchone()[0]
+
+    def fetch(self, offset, limit):
+        if not self.expression:
+            return []
+        where, params = self.where()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {self.id_column} {where} GROUP BY {self.id_column} "
+                "ORDER BY MIN(rank) LIMIT %s OFFSET %s",
+                params + [limit, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        objects = self.queryset.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in objects]
+        if missing and self.archive is not None:
+            objects.update(self.archive.in_bulk(missing))
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+class SearchResults:
+    # Projects, then issues, then users, read one slice at a time so a page
+    # never loads more rows than it shows
+
+    def __init__(self, sources=()):
+        self.sources = list(sources)
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [source.count() for source in self.sources]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count())
+            if step != 1:
+                raise ValueError("Search results only support contiguous slices")
+            return self.fetch(start, stop - start)
+        if index < 0:
+            index += self.count()
+        items = self.fetch(index, 1)
+        if not items:
+            raise IndexError("Search result index out of range")
+        return items[0]
+
+    def __iter__(self):
+        for source, count in zip(self.sources, self.counts()):
+            yield from source.fetch(0, count)
+
+    def fetch(self, offset, limit):
+        items = []
+        for source, count in zip(self.sources, self.counts()):
+            if limit <= 0:
+                break
+            if offset >= count:
+                offset -= count
+                continue
+            taken = source.fetch(offset, min(limit, count - offset))
+            items.extend(taken)
+            limit -= len(taken)
+            offset = 0
+        return items
+
+
+def search(search_query):
+    # the columns and relations search.html shows for each result
+    project_rows = Project.objects.select_related('created_by').defer('summary')
+    issue_rows = Issue.objects.select_related('project', 'created_by').defer('summary', 'project__summary')
+    archived_rows = ArchivedIssue.objects.select_related('project', 'created_by').defer('summary', 'project__summary')
+    if search_index_available():
+        # an issue is found by its own title and summary or by any of its comments
+        projects = IndexSource(project_rows, ['project'], 'object_id', search_query)
+        issues = IndexSource(issue_rows, ['issue', 'comment'], 'issue_id', search_query, archive=archived_rows)
+        sources = [projects, issues]
+    else:
+        projects = QuerySetSource(project_rows.filter(title__icontains=search_query))
+        issues = QuerySetSource(issue_rows.filter(title__icontains=search_query))
+        archived_issues = QuerySetSource(archived_rows.filter(title__icontains=search_query))
+        sources = [projects, issues, archived_issues]
+    users = QuerySetSource(User.objects.filter(name__icontains=search_query))
+    return SearchResults([*sources, users])
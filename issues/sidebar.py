@@ -0,0 +1,89 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from issues.models import Issue, Project
+
+SIDEBAR_LENGTH = 5
+
+
+def viewer_id(user):
+    return user.pk if user.is_authenticated else 'anonymous'
+
+
+def sidebar_key(viewer):
+    return f'sidebar:{viewer}'
+
+
+def generation_key(viewer):
+    return f'sidebar:generation:{viewer}'
+
+
+def sidebar_generation(user):
+    return cache.get(generation_key(viewer_id(user)))
+
+
+def assigned_user_pks(issue_filter=None, project_filter=None):
+    # the users whose sidebars list the matching issues or projects, read
+    # from both assignment tables in one query
+    querysets = []
+    if issue_filter is not None:
+        querysets.append(Issue.assigned_users.through.objects.filter(**issue_filter).values_list('user_id', flat=True))
+    if project_filter is not None:
+        querysets.append(Project.assigned_users.through.objects.filter(**project_filter).values_list('user_id', flat=True))
+    return set(querysets[0].union(*querysets[1:]))
+
+
+def shown_to_anonymous(instance):
+    # the anonymous sidebar only changes when the row is on it, or when it
+    # still has room for another one
+    cached = cache.get(sidebar_key('anonymous'))
+    if cached is None:
+        return False
+    _, issues, projects = cached
+    if isinstance(instance, Issue):
+        return len(issues) < SIDEBAR_LENGTH or any(issue.pk == instance.pk for issue in issues)
+    # listed issues show their project too
+    return (
+        len(projects) < SIDEBAR_LENGTH
+        or any(project.pk == instance.pk for project in projects)
+        or any(issue.project_id == instance.pk for issue in issues)
+    )
+
+
+def invalidate_sidebars(user_pks, instance=None):
+    # every cached sidebar is stored with its viewer's generation, a new
+    # generation makes that viewer's sidebar and page ETags stale
+    viewers = list(user_pks)
+    if instance is not None and shown_to_anonymous(instance):
+        viewers.append('anonymous')
+    cache.set_many({generation_key(viewer): uuid.uuid4().hex for viewer in viewers}, None)
+
+
+def load_sidebar_lists(user):
+    if user.is_authenticated:
+        issues = user.issues_assigned.order_by('-last_visit')
+        projects = user.projects_assigned.order_by('-modified_on')
+    else:
+        issues = Issue.objects.order_by('-hotness', '-visits')
+        projects = Project.objects.order_by('-hotness', '-visits')
+    issues = list(issues.select_related('project')[:SIDEBAR_LENGTH])
+    projects = list(projects[:SIDEBAR_LENGTH])
+    return issues, projects
+
+
+def get_sidebar_lists(user):
+    viewer = viewer_id(user)
+    cached = cache.get_many([sidebar_key(viewer), generation_key(viewer)])
+    generation = cached.get(generation_key(viewer))
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(generation_key(viewer), generation, None)
+    entry = cached.get(sidebar_key(viewer))
+    if entry is not None and entry[0] == generation:
+        return entry[1], entry[2]
+
+    issues, projects = load_sidebar_lists(user)
+    cache.set(sidebar_key(viewer), (generation, issues, projects), getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 300))
+    return issues, projects
@@ -0,0 +1,111 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+from issues.models import Issue, Project, Comment, ArchivedIssue, ArchivedComment
+from issues import search
+from issues.sidebar import assigned_user_pks, invalidate_sidebars
+from issues.page_cache import invalidate_tags
+from issues.comment_cache import comments_tag
+
+
+@receiver(connection_created)
+def reset_search_index_on_connect(sender, connection, **kwargs):
+    search.reset_search_index_available(connection)
+
+
+@receiver(post_migrate)
+def reset_search_index_after_migrate(sender, using, **kwargs):
+    search.reset_search_index_available(connections[using])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Issue)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, **kwargs):
+    search.update_index(instance)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Issue)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=ArchivedIssue)
+@receiver(post_delete, sender=ArchivedComment)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_from_index(instance)
+
+
+# a sidebar lists the viewer's assigned issues and projects, with each
+# project's issue count, so a change only reaches the users assigned to it
+@receiver(post_save, sender=Issue)
+def invalidate_issue_sidebars(sender, instance, created, **kwargs):
+    if created:
+        users = assigned_user_pks(project_filter={'project_id': instance.project_id})
+    else:
+        users = assigned_user_pks(issue_filter={'issue_id': instance.pk})
+    invalidate_sidebars(users, instance)
+
+
+@receiver(pre_delete, sender=Issue)
+def invalidate_deleted_issue_sidebars(sender, instance, **kwargs):
+    users = assigned_user_pks(issue_filter={'issue_id': instance.pk}, project_filter={'project_id': instance.project_id})
+    invalidate_sidebars(users, instance)
+
+
+@receiver(post_save, sender=Project)
+@receiver(pre_delete, sender=Project)
+def invalidate_project_sidebars(sender, instance, **kwargs):
+    invalidate_sidebars(assigned_user_pks(project_filter={'project_id': instance.pk}), instance)
+
+
+@receiver(m2m_changed, sender=Project.assigned_users.through)
+@receiver(m2m_changed, sender=Issue.assigned_users.through)
+def invalidate_assigned_sidebars(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # the change went through user.issues_assigned or user.projects_assigned
+        users = [instance.pk]
+    elif action == 'pre_clear':
+        users = list(instance.assigned_users.values_list('pk', flat=True))
+    else:
+        users = pk_set
+    invalidate_sidebars(users)
+
+
+# every page shows the sidebar, so any issue or project change reaches all of
+# them, comments only change their own issue's page
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def invalidate_issue_pages(sender, instance, **kwargs):
+    invalidate_tags('issues', f'issue:{instance.pk}')
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_pages(sender, instance, **kwargs):
+    invalidate_tags('projects')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    invalidate_tags(f'issue:{instance.issue_id}', comments_tag(instance.issue_id))
+
+
+# creating a row bumps its counter inside Issue.save and Comment.save, deletes
+# are counted here so cascades are included. Issues marked for deletion were
+# already taken off their project's count, and the default manager leaves
+# them out of the comment count updates while they are purged.
+@receiver(post_delete, sender=Issue)
+def decrement_issue_count(sender, instance, **kwargs):
+    if instance.pending_delete:
+        return
+    Project.objects.filter(pk=instance.project_id).update(issue_count=F('issue_count') - 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    Issue.objects.filter(pk=instance.issue_id).update(comment_count=F('comment_count') - 1)
@@ -1,7 +1,6 @@
 const add_user = document.getElementById('add-user');
 const remove_user = document.getElementById('remove-user');
-const reply_links = document.querySelectorAll('[id^="reply-link-"]');
-const hide_replies = document.querySelectorAll('[id^="hide-replies-"]')
+const reply_form = document.getElementById('reply-form');
 
 if(add_user){
   add_user.addEventListener("click", function(element) {
@@ -29,43 +28,61 @@ if(remove_user){
   });
 }
 
-reply_links.forEach(link => {
-  link.addEventListener("click", function() {
-    this.classList.toggle("active");
-    //get the id of parent from class name
-    let class_name = 'reply-form-' + link.id.substring(11);
-    let content = document.getElementsByClassName(class_name)[0];
-    if (content.style.display === "block"){
-      content.style.display = "none";
-    } else {
-      content.style.display = "block";
-    }
-  });
-})
+// comments can be loaded after the page, so their links are handled from
+// the document instead of one listener per link
+document.addEventListener("click", function(event) {
+  let link = event.target.closest('[id^="reply-link-"]');
+  if (link) {
+    toggle_reply_form(link);
+  }
+  link = event.target.closest('[id^="hide-replies-"]');
+  if (link) {
+    toggle_replies(link);
+  }
+});
 
-hide_replies.forEach(link => {
-  link.addEventListener("click", function() {
-    console.log("inside click function")
-    this.classList.toggle("active");
-    let class_name = 'reply-tree-' + link.id.substring(13);
-    let content = document.getElementsByClassName(class_name)[0];
-
-    if (content.style.display === "block"){
-      content.style.display = "none";
-    } else {
-      content.style.display = "block";
-    }
+function toggle_reply_form(link) {
+  link.classList.toggle("active");
+  //get the id of parent from class name
+  let class_name = 'reply-form-' + link.id.substring(11);
+  let content = document.getElementsByClassName(class_name)[0];
+  // the page has a single reply form, it moves to the comment being replied to
+  if (reply_form.parentElement !== content) {
+    reply_form.parentElement.style.display = "none";
+    reply_form.action = link.dataset.action;
+    content.appendChild(reply_form);
+  }
+  if (content.style.display === "block"){
+    content.style.display = "none";
+  } else {
+    content.style.display = "block";
+  }
+}
 
-    let str = link.innerHTML;
-    let last_char = str.length - 1;
+function toggle_replies(link) {
+  link.classList.toggle("active");
+  let class_name = 'reply-tree-' + link.id.substring(13);
+  let content = document.getElementsByClassName(class_name)[0];
 
-    if (link.innerHTML[last_char] === "\u2193"){  //unicode for down arrow
-      new_str = str.slice(0, -1) + "\u2191";  // unicode for up arrow
-      link.innerHTML = new_str;
-    } else {
-      new_str = str.slice(0, -1) + "\u2193";
-      link.innerHTML = new_str;
+  if (content.style.display === "block"){
+    content.style.display = "none";
+  } else {
+    content.style.display = "block";
+    // replies that were not sent with the page are loaded when first opened
+    let first = content.querySelector(':scope > ul > li');
+    if (first && first.classList.contains('load-more')) {
+      first.querySelector('a').click();
     }
+  }
 
-  });
-})
+  let str = link.innerHTML;
+  let last_char = str.length - 1;
+
+  if (link.innerHTML[last_char] === "\u2193"){  //unicode for down arrow
+    new_str = str.slice(0, -1) + "\u2191";  // unicode for up arrow
+    link.innerHTML = new_str;
+  } else {
+    new_str = str.slice(0, -1) + "\u2193";
+    link.innerHTML = new_str;
+  }
+}
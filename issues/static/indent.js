@@ -1,6 +1,10 @@
-const comments = document.querySelectorAll('.comment')
+function indent_comments(root) {
+  const comments = root.querySelectorAll('.comment')
 
-comments.forEach(comment => {
-  const depth = comment.getAttribute('data-depth');
-  comment.style.setProperty('--indent-level', depth);
-});
+  comments.forEach(comment => {
+    const depth = comment.getAttribute('data-depth');
+    comment.style.setProperty('--indent-level', depth);
+  });
+}
+
+indent_comments(document);
@@ -0,0 +1,25 @@
+// "More comments" and "More replies" links are replaced by the next page of
+// comments, which ends with another link while there are more to load
+document.addEventListener("click", function(event) {
+  let link = event.target.closest('.load-more a');
+  if (!link || link.classList.contains("loading")) {
+    return;
+  }
+  link.classList.add("loading");
+  let item = link.closest('.load-more');
+
+  fetch(link.dataset.url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(html => {
+      let list = document.createElement('ul');
+      list.innerHTML = html;
+      indent_comments(list);
+      item.replaceWith(...list.children);
+    })
+    .catch(() => link.classList.remove("loading"));
+});
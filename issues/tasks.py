@@ -0,0 +1,18 @@
+from tasks.queue import task
+
+from issues import counters, purge
+
+
+@task
+def purge_deleted_project(project_id):
+    purge.purge_deleted(project_id=project_id)
+
+
+@task
+def purge_deleted_issue(issue_id):
+    purge.purge_deleted(issue_id=issue_id)
+
+
+@task
+def repair_counters():
+    counters.repair_counters()
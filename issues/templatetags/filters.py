@@ -1,7 +1,7 @@
 from django import template
 from importlib import import_module
 from django.contrib.auth import get_user_model
-from issues.models import Issue, Project
+from issues.models import Issue, Project, ArchivedIssue
 import sys
 
 User = get_user_model()
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from issues.counters import visit_counter
+from issues.middleware import query_budget
+
+
+class QueryBudgetMixin:
+    # Test case mixin checking requests against the QUERY_BUDGETS setting.
+    # The cache is cleared first so every request is measured cold, visits
+    # stay buffered and tasks are queued as they are outside of development.
+
+    def capture_queries(self, url, method='get', data=None):
+        cache.clear()
+        with override_settings(VISIT_COUNTER_FLUSH_INTERVAL=3600, TASKS_EAGER=False):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+        visit_counter.clear()
+        return response, queries
+
+    def count_queries(self, url, method='get', data=None):
+        _, queries = self.capture_queries(url, method, data)
+        return len(queries)
+
+    def assertWithinQueryBudget(self, url, method='get', data=None, budget=None):
+        response, queries = self.capture_queries(url, method, data)
+        view_name = response.resolver_match.view_name
+        if budget is None:
+            budget = query_budget(view_name)
+        self.assertIsNotNone(budget, f'{view_name} has no query budget')
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url} ({view_name}) ran {len(queries)} queries, its budget is {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        return response
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from issues.archive import archive_closed_issues, archive_cutoff
+from issues.models import Issue, Project, Comment, ArchivedIssue, ArchivedComment
+from issues.search import search, search_index_available
+
+User = get_user_model()
+
+
+class ArchiveTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        self.project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=self.user,
+            modified_by=self.user
+        )
+
+    def create_issue(self, title, closed_days_ago=None):
+        issue = Issue.objects.create(
+            title=title,
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        if closed_days_ago is not None:
+            Issue.objects.filter(id=issue.id).update(
+                issue_status=Issue.CLOSED,
+                closed_by=self.user,
+                closed_on=timezone.now() - timedelta(days=closed_days_ago),
+            )
+        return issue
+
+    def test_only_issues_closed_before_the_cutoff_are_archived(self):
+        old = self.create_issue('Old', closed_days_ago=100)
+        recent = self.create_issue('Recent', closed_days_ago=10)
+        still_open = self.create_issue('Open')
+
+        self.assertEqual(archive_closed_issues(archive_cutoff(90)), 1)
+
+        self.assertEqual(set(Issue.objects.values_list('id', flat=True)), {recent.id, still_open.id})
+        archived = ArchivedIssue.objects.get()
+        self.assertEqual((archived.id, archived.title, archived.closed_by), (old.id, 'Old', self.user))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.issue_count, 2)
+
+    def test_comments_and_assignments_move_with_the_issue(self):
+        issue = self.create_issue('Old', closed_days_ago=100)
+        issue.assigned_users.add(self.user)
+        first = Comment.objects.create(user=self.user, text='first', issue=issue)
+        reply = Comment.objects.create(user=self.user, text='reply', issue=issue, parent_comment=first)
+
+        archive_closed_issues(archive_cutoff(90))
+
+        self.assertFalse(Comment.objects.exists())
+        archived = ArchivedIssue.objects.get()
+        self.assertEqual(archived.comment_count, 2)
+        self.assertEqual(list(archived.assigned_users.all()), [self.user])
+        comments = list(archived.comments.order_by('path'))
+        self.assertEqual([(c.id, c.path) for c in comments], [(first.id, first.path), (reply.id, reply.path)])
+        self.assertEqual(comments[1].parent_comment, comments[0])
+
+    def test_issues_are_archived_in_batches(self):
+        for i in range(5):
+            self.create_issue(f'Old {i}', closed_days_ago=100)
+        self.assertEqual(archive_closed_issues(archive_cutoff(90), batch_size=2), 5)
+        self.assertEqual(ArchivedIssue.objects.count(), 5)
+        self.assertFalse(Issue.objects.exists())
+
+    def test_command_reports_archived_issues(self):
+        self.create_issue('Old', closed_days_ago=100)
+        self.create_issue('Recent', closed_days_ago=10)
+        out = StringIO()
+        call_command('archive_issues', days=30, stdout=out)
+        self.assertIn('Archived 1 issues', out.getvalue())
+
+    def test_closing_an_issue_records_when(self):
+        issue = self.create_issue('Open')
+        issue.assigned_users.add(self.user)
+        self.client.force_login(self.user)
+        self.client.post(f'/close_issue/{issue.id}')
+        issue.refresh_from_db()
+        self.assertIsNotNone(issue.closed_on)
+        self.client.post(f'/open_issue/{issue.id}')
+        issue.refresh_from_db()
+        self.assertIsNone(issue.closed_on)
+
+    def test_archived_issue_details_are_read_only(self):
+        issue = self.create_issue('Old', closed_days_ago=100)
+        issue.assigned_users.add(self.user)
+        comment = Comment.objects.create(user=self.user, text='archived comment', issue=issue)
+        archive_closed_issues(archive_cutoff(90))
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/issue_details/{issue.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'archived_issue_details.html')
+        self.assertContains(response, 'archived comment')
+        self.assertContains(response, 'can no longer be changed')
+        self.assertNotContains(response, f'/close_issue/{issue.id}')
+        self.assertNotContains(response, f'/add_comment/{issue.id}')
+        self.assertNotContains(response, f'reply-link-{comment.id}')
+        self.assertNotContains(response, '<!--edit-form')
+
+    def test_search_finds_archived_issues(self):
+        issue = self.create_issue('Forgotten gadget', closed_days_ago=100)
+        Comment.objects.create(user=self.user, text='sprocket mentioned in a comment', issue=issue)
+        archive_closed_issues(archive_cutoff(90))
+
+        self.assertEqual(list(search('gadget')), [ArchivedIssue.objects.get()])
+        if search_index_available():
+            self.assertEqual(list(search('sprocket')), [ArchivedIssue.objects.get()])
+        response = self.client.get('/search', data={'search_query': 'gadget'})
+        self.assertContains(response, f'/issue_details/{issue.id}')
+
+    def test_deleting_the_project_removes_the_archive(self):
+        issue = self.create_issue('Forgotten gadget', closed_days_ago=100)
+        Comment.objects.create(user=self.user, text='sprocket', issue=issue)
+        archive_closed_issues(archive_cutoff(90))
+        self.project.delete()
+        self.assertFalse(ArchivedIssue.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+        self.assertEqual(list(search('sprocket')), [])
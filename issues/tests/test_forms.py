@@ -333,6 +333,27 @@ class AddCommentFormTest(TestCase):
         self.assertEqual(parent.replies.first(), reply)
         self.assertEqual(reply.parent_comment, parent)
 
+    def test_reply_too_deep_for_its_path_is_invalid(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test Issue",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        parent = Comment.objects.create(user=user, text='This is a comment', issue=issue)
+        # as deep as the path allows
+        parent.path = f'{parent.id:010d}/' * (Comment.MAX_DEPTH + 1)
+
+        form = CommentForm(user=user, issue=issue, parent=parent, data={
+            'text': 'This is a reply'
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('levels deep', form.non_field_errors()[0])
+        self.assertEqual(Comment.objects.count(), 1)
+
     def test_base_comment_has_no_depth(self):
         user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
         project = create_test_project(user)
@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase
+
+from issues.hyperloglog import HyperLogLog
+
+
+class HyperLogLogTest(SimpleTestCase):
+
+    def test_empty_sketch_counts_zero(self):
+        self.assertEqual(len(HyperLogLog()), 0)
+
+    def test_repeated_values_count_once(self):
+        sketch = HyperLogLog()
+        for i in range(100):
+            sketch.add('visitor')
+        self.assertEqual(len(sketch), 1)
+
+    def test_small_counts_are_close_to_exact(self):
+        sketch = HyperLogLog()
+        for i in range(50):
+            sketch.add(f'visitor{i}')
+        self.assertAlmostEqual(len(sketch), 50, delta=2)
+
+    def test_large_counts_are_within_error(self):
+        sketch = HyperLogLog()
+        for i in range(20000):
+            sketch.add(f'visitor{i}')
+        self.assertAlmostEqual(len(sketch), 20000, delta=20000 * 0.1)
+
+    def test_merge_counts_the_union(self):
+        monday = HyperLogLog()
+        tuesday = HyperLogLog()
+        for i in range(1000):
+            monday.add(f'visitor{i}')
+        for i in range(500, 1500):
+            tuesday.add(f'visitor{i}')
+        self.assertAlmostEqual(len(monday.merge(tuesday)), 1500, delta=1500 * 0.1)
+
+    def test_round_trips_through_bytes(self):
+        sketch = HyperLogLog()
+        for i in range(300):
+            sketch.add(f'visitor{i}')
+        data = sketch.to_bytes()
+        self.assertEqual(len(data), 1024)
+        self.assertEqual(len(HyperLogLog.from_bytes(data)), len(sketch))
@@ -0,0 +1,143 @@
+from django.test import TestCase, RequestFactory
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from issues.identity import IdentityMap, identity_map
+from issues.comment_tree import load_comment_page
+from issues.models import Issue, Project, Comment
+
+User = get_user_model()
+
+
+class IdentityMapTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        cls.other_user = User.objects.create(name='user2', email="user2@example.org", password="chondosha5563")
+        cls.project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=cls.user,
+            modified_by=cls.user
+        )
+        cls.issue = Issue.objects.create(
+            title='Test Issue',
+            project=cls.project,
+            summary='This is a test issue',
+            created_by=cls.user,
+            modified_by=cls.user,
+        )
+
+    def test_get_fetches_a_row_once(self):
+        identities = IdentityMap()
+        with self.assertNumQueries(1):
+            first = identities.get(Issue, self.issue.id)
+            second = identities.get(Issue, str(self.issue.id))
+        self.assertIs(first, second)
+
+    def test_get_raises_for_missing_rows(self):
+        with self.assertRaises(Issue.DoesNotExist):
+            IdentityMap().get(Issue, self.issue.id + 1)
+
+    def test_select_related_rows_are_added(self):
+        identities = IdentityMap()
+        issue = identities.get(Issue, self.issue.id, Issue.objects.select_related('project', 'created_by'))
+        with self.assertNumQueries(0):
+            self.assertIs(identities.get(Project, self.project.id), issue.project)
+            self.assertIs(identities.get(User, self.user.pk), issue.created_by)
+
+    def test_foreign_keys_are_filled_from_the_map(self):
+        identities = IdentityMap()
+        project = identities.get(Project, self.project.id)
+        user = identities.get(User, self.user.pk)
+        issue = identities.get(Issue, self.issue.id)
+        with self.assertNumQueries(0):
+            self.assertIs(issue.project, project)
+            self.assertIs(issue.created_by, user)
+            self.assertIs(issue.modified_by, user)
+
+    def test_copies_of_loaded_rows_are_replaced(self):
+        identities = IdentityMap()
+        user = identities.get(User, self.user.pk)
+        issue = identities.get(Issue, self.issue.id, Issue.objects.select_related('created_by'))
+        self.assertIs(issue.created_by, user)
+
+    def test_get_many_only_fetches_missing_rows(self):
+        identities = IdentityMap()
+        user = identities.get(User, self.user.pk)
+        with self.assertNumQueries(1):
+            users = identities.get_many(User, [self.user.pk, self.other_user.pk, self.other_user.pk + 1])
+        self.assertEqual(set(users), {self.user.pk, self.other_user.pk})
+        self.assertIs(users[self.user.pk], user)
+        with self.assertNumQueries(0):
+            identities.get_many(User, [self.user.pk, self.other_user.pk])
+
+    def test_get_by_finds_loaded_rows(self):
+        identities = IdentityMap()
+        user = identities.get(User, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(identities.get_by(User, name='chondosha'), user)
+        with self.assertNumQueries(1):
+            other_user = identities.get_by(User, name='user2')
+        self.assertIs(identities.get(User, self.other_user.pk), other_user)
+
+    def test_get_by_raises_for_missing_rows(self):
+        with self.assertRaises(User.DoesNotExist):
+            IdentityMap().get_by(User, name='nobody')
+
+    def test_request_map_starts_with_the_user(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        identities = identity_map(request)
+        self.assertIs(identity_map(request), identities)
+        with self.assertNumQueries(0):
+            self.assertIs(identities.get(User, self.user.pk), self.user)
+
+    def test_request_map_skips_anonymous_users(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        self.assertEqual(identity_map(request).instances, {})
+
+    def test_comment_tree_shares_loaded_rows(self):
+        first = Comment.objects.create(user=self.user, text='first', issue=self.issue)
+        Comment.objects.create(user=self.user, text='second', issue=self.issue)
+        Comment.objects.create(user=self.other_user, text='reply', issue=self.issue, parent_comment=first)
+        identities = IdentityMap()
+        user = identities.get(User, self.user.pk)
+        issue = identities.get(Issue, self.issue.id)
+        # the threads and their first replies
+        with self.assertNumQueries(2):
+            page, comments = load_comment_page(issue, identities=identities)
+            for comment in comments:
+                self.assertIs(comment.issue, issue)
+                comment.user
+                comment.parent_comment
+        first, second, reply = comments
+        self.assertIs(first.user, user)
+        self.assertIs(second.user, user)
+        self.assertIs(reply.parent_comment, first)
+
+
+class IdentityMapViewTest(TestCase):
+
+    def test_add_user_to_project_looks_the_user_up_once(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        User.objects.create(name='user2', email="user2@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(f'/add_user_to_project/{project.id}', data={'username': 'user2'})
+        user_lookups = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "accounts_user" WHERE "accounts_user"."name" = \'user2\'' in query['sql']
+        ]
+        self.assertEqual(len(user_lookups), 1)
+        self.assertIn('user2', project.assigned_users.values_list('name', flat=True))
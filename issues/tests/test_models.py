@@ -1,6 +1,15 @@
-from django.test import TestCase
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 
+from issues.counters import visit_counter, hotness_weight
 from issues.models import Issue, Project, Comment
 
 User = get_user_model()
@@ -30,10 +39,86 @@ class ProjectModelTest(TestCase):
             modified_by=user,
         )
         self.assertEqual(project.issue_count, 2)
+        project.refresh_from_db()
+        self.assertEqual(project.issue_count, 2)
+
+    def test_issue_count_is_decremented_on_delete(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        issue.delete()
+        project.refresh_from_db()
+        self.assertEqual(project.issue_count, 0)
+
+    def test_stale_save_does_not_overwrite_issue_count(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        stale_project = Project.objects.get(id=project.id)
+        Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        stale_project.title = 'Renamed Project'
+        stale_project.save()
+
+        project.refresh_from_db()
+        self.assertEqual(project.title, 'Renamed Project')
+        self.assertEqual(project.issue_count, 1)
 
 
 class IssueModelTest(TestCase):
 
+    def test_stale_save_does_not_overwrite_flushed_visits(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        stale_issue = Issue.objects.get(id=issue.id)
+        stale_project = Project.objects.get(id=project.id)
+        visit_counter.record(Issue, issue.id)
+        visit_counter.record(Project, project.id)
+        visit_counter.flush()
+        visited = Issue.objects.get(id=issue.id).last_visit
+
+        stale_issue.title = 'Renamed Issue'
+        stale_issue.save()
+        stale_project.title = 'Renamed Project'
+        stale_project.save()
+
+        issue.refresh_from_db()
+        project.refresh_from_db()
+        self.assertEqual((issue.title, issue.visits, issue.last_visit), ('Renamed Issue', 1, visited))
+        self.assertEqual((project.title, project.visits), ('Renamed Project', 1))
+
     def test_property_comment_count(self):
         user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
         project = Project.objects.create(
@@ -65,6 +150,86 @@ class IssueModelTest(TestCase):
             parent_comment=comment1,
         )
         self.assertEqual(issue.comment_count, 2)
+        issue.refresh_from_db()
+        self.assertEqual(issue.comment_count, 2)
+
+    def test_comment_count_includes_deleted_threads(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        comment1 = Comment.objects.create(user=user, text='This is a comment', issue=issue)
+        comment2 = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=comment1)
+        Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=comment2)
+        Comment.objects.create(user=user, text='This is a comment', issue=issue)
+
+        comment1.delete()
+        issue.refresh_from_db()
+        self.assertEqual(issue.comment_count, 1)
+
+    def test_repair_counters_command_fixes_drift(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        Comment.objects.bulk_create([
+            Comment(user=user, text='This is a comment', issue=issue),
+            Comment(user=user, text='This is a comment', issue=issue),
+        ])
+        Project.objects.filter(id=project.id).update(issue_count=7)
+
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('Project.issue_count: repaired 1 rows', out.getvalue())
+        self.assertIn('Issue.comment_count: repaired 1 rows', out.getvalue())
+
+        project.refresh_from_db()
+        issue.refresh_from_db()
+        self.assertEqual(project.issue_count, 1)
+        self.assertEqual(issue.comment_count, 2)
+
+    def test_status_is_stored_as_a_number_with_a_label(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        self.assertTrue(issue.is_open)
+        self.assertEqual(issue.get_issue_status_display(), 'Open')
+        Issue.objects.filter(id=issue.id).update(issue_status=Issue.CLOSED)
+        issue.refresh_from_db()
+        self.assertFalse(issue.is_open)
+        self.assertEqual(issue.get_issue_status_display(), 'Closed')
+        self.assertEqual(Issue.objects.filter(issue_status=2).count(), 1)
 
 
 
@@ -140,3 +305,217 @@ class CommentModelTest(TestCase):
 
         self.assertEqual(comment1.reply_count, 2)
         self.assertEqual(comment2.reply_count, 1)
+
+    def test_comment_path_extends_parent_path(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        comment1 = Comment.objects.create(
+            user=user,
+            text='This is a comment',
+            issue=issue,
+        )
+        comment2 = Comment.objects.create(
+            user=user,
+            text='This is a comment',
+            issue=issue,
+            parent_comment=comment1,
+        )
+        self.assertEqual(comment1.path, f'{comment1.id:010d}/')
+        self.assertEqual(comment2.path, f'{comment1.id:010d}/{comment2.id:010d}/')
+        self.assertEqual(Comment.objects.get(id=comment2.id).path, comment2.path)
+
+        comment2.text = 'Edited comment'
+        comment2.save()
+        self.assertEqual(Comment.objects.get(id=comment2.id).path, comment2.path)
+
+    def test_replies_deeper_than_the_path_allows_are_rejected(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        parent = None
+        for depth in range(Comment.MAX_DEPTH + 1):
+            parent = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=parent, depth=depth)
+        self.assertLessEqual(len(parent.path), Comment.PATH_MAX_LENGTH)
+
+        with self.assertRaises(ValidationError):
+            Comment.objects.create(user=user, text='too deep', issue=issue, parent_comment=parent)
+        self.assertEqual(Comment.objects.count(), Comment.MAX_DEPTH + 1)
+
+    def test_path_backfill_handles_deep_threads(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        parent = None
+        for depth in range(Comment.MAX_DEPTH + 1):
+            parent = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=parent, depth=depth)
+        paths = dict(Comment.objects.values_list('id', 'path'))
+        Comment.objects.update(path='')
+
+        migration = import_module('issues.migrations.0014_comment_path')
+        migration.backfill_comment_paths(apps, None)
+        self.assertEqual(dict(Comment.objects.values_list('id', 'path')), paths)
+
+        # one level more than the path can hold
+        deepest = Comment.objects.create(user=user, text='reply', issue=issue)
+        Comment.objects.filter(pk=deepest.pk).update(parent_comment=parent)
+        with self.assertRaises(ValueError):
+            migration.backfill_comment_paths(apps, None)
+
+    def test_reply_count_is_a_single_query(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        comment = Comment.objects.create(user=user, text='This is a comment', issue=issue)
+        parent = comment
+        for i in range(5):
+            parent = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=parent)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(comment.reply_count, 5)
+
+    def test_delete_removes_whole_thread(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        comment1 = Comment.objects.create(user=user, text='This is a comment', issue=issue)
+        comment2 = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=comment1)
+        Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=comment2)
+        other_comment = Comment.objects.create(user=user, text='This is a comment', issue=issue)
+
+        comment1.delete()
+        self.assertEqual(list(Comment.objects.all()), [other_comment])
+
+    def test_deleting_project_cascades_without_errors(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        Comment.objects.create(user=user, text='This is a comment', issue=issue)
+
+        project.delete()
+        self.assertEqual(Issue.objects.count(), 0)
+        self.assertEqual(Comment.objects.count(), 0)
+
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_visits_are_counted_when_the_hotness_weight_overflows(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        self.addCleanup(visit_counter.clear)
+        half_life = settings.HOTNESS_HALF_LIFE
+        now = timezone.now().timestamp()
+
+        # just below the float limit the weight still counts
+        with self.settings(HOTNESS_EPOCH=now - 1023.5 * half_life):
+            visit_counter.record(Project, project.id, 'session:first')
+            visit_counter.flush()
+        project.refresh_from_db()
+        self.assertGreater(project.hotness, 2 ** 1023)
+        hotness = project.hotness
+
+        with self.settings(HOTNESS_EPOCH=now - 1024.5 * half_life):
+            visit_counter.record(Project, project.id, 'session:second')
+            with self.assertLogs('issues.counters', 'ERROR') as logs:
+                self.assertEqual(visit_counter.flush(), 1)
+        self.assertIn('rescale_hotness', logs.output[0])
+        project.refresh_from_db()
+        self.assertEqual(project.visits, 2)
+        self.assertEqual(project.hotness, hotness)
+
+    def test_rescale_hotness_moves_scores_onto_the_new_epoch(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        now = timezone.now()
+        old_epoch = settings.HOTNESS_EPOCH
+        new_epoch = old_epoch + 10 * settings.HOTNESS_HALF_LIFE
+        Issue.objects.filter(id=issue.id).update(hotness=3 * hotness_weight(now))
+        Project.objects.filter(id=project.id).update(hotness=hotness_weight(now))
+
+        out = StringIO()
+        with self.settings(HOTNESS_EPOCH=new_epoch):
+            call_command('rescale_hotness', previous_epoch=old_epoch, stdout=out)
+            self.assertAlmostEqual(Issue.objects.get(id=issue.id).hotness / hotness_weight(now), 3)
+            self.assertAlmostEqual(Project.objects.get(id=project.id).hotness / hotness_weight(now), 1)
+        self.assertIn('Issue: rescaled 1 rows', out.getvalue())
@@ -0,0 +1,123 @@
+import base64
+import datetime
+import json
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from issues.models import Issue, Project
+from issues.pagination import KeysetPaginator
+
+User = get_user_model()
+
+
+def create_issues(count):
+    user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+    project = Project.objects.create(
+        title="Test Project",
+        summary="This is a test project",
+        created_by=user,
+        modified_by=user
+    )
+    for i in range(count):
+        Issue.objects.create(
+            title=f"Test {i}",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+            visits=i % 3,
+        )
+    return project
+
+
+class KeysetPaginatorTest(TestCase):
+
+    def test_next_pages_follow_the_queryset_order(self):
+        create_issues(25)
+        queryset = Issue.objects.all()
+        paginator = KeysetPaginator(queryset, 10)
+
+        pages = []
+        page = paginator.page()
+        pages.append(page.object_list)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            pages.append(page.object_list)
+
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), list(queryset.order_by('-visits', '-created_on', 'issue_status', 'priority', 'pk')))
+
+    def test_previous_cursor_returns_previous_page(self):
+        create_issues(25)
+        paginator = KeysetPaginator(Issue.objects.order_by('-created_on'), 10)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+
+        self.assertFalse(third.has_next())
+        self.assertEqual(paginator.page(third.previous_cursor).object_list, second.object_list)
+        back_to_first = paginator.page(second.previous_cursor)
+        self.assertEqual(back_to_first.object_list, first.object_list)
+        self.assertFalse(back_to_first.has_previous())
+
+    def test_ties_on_every_ordering_column_are_not_skipped(self):
+        project = create_issues(0)
+        user = User.objects.get(name='chondosha')
+        created_on = timezone.now() - datetime.timedelta(days=1)
+        for i in range(7):
+            issue = Issue.objects.create(title="Tie", project=project, summary="Tie", created_by=user, modified_by=user)
+            Issue.objects.filter(pk=issue.pk).update(created_on=created_on)
+        paginator = KeysetPaginator(Issue.objects.all(), 3)
+
+        seen = []
+        page = paginator.page()
+        seen.extend(page.object_list)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(page.object_list)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+
+class CursorPaginationViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_parameter_switches_issue_list_to_cursor_pages(self):
+        create_issues(15)
+        response = self.client.get('/issue_list', data={'cursor': ''})
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(len(response.context['issue_list']), 10)
+        self.assertEqual(response.context['approximate_total'], 15)
+
+        response = self.client.get('/issue_list', data={'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(response.context['issue_list']), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    @override_settings(KEYSET_PAGINATION=True)
+    def test_setting_enables_cursor_pages_for_project_details(self):
+        project = create_issues(12)
+        response = self.client.get(f'/project_details/{project.id}/open')
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertContains(response, 'cursor=')
+
+    def test_invalid_cursor_returns_404(self):
+        create_issues(1)
+        response = self.client.get('/issue_list', data={'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_null_values_returns_404(self):
+        create_issues(1)
+        cursor = base64.urlsafe_b64encode(json.dumps(['next', [None] * 5]).encode()).decode()
+        response = self.client.get('/issue_list', data={'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_numbered_pages_are_still_the_default(self):
+        create_issues(15)
+        response = self.client.get('/project_list')
+        self.assertNotIn('cursor_pagination', response.context)
+        self.assertEqual(response.context['total_pages'], 1)
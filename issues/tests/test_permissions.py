@@ -0,0 +1,79 @@
+from django.test import TestCase, RequestFactory
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from issues.permissions import get_permissions, load_permissions
+from issues.models import Issue, Project
+
+User = get_user_model()
+
+
+class PermissionsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        self.other_user = User.objects.create(name='user2', email="user2@example.org", password="chondosha5563")
+        self.project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=self.user,
+            modified_by=self.user
+        )
+        self.project.assigned_users.add(self.user)
+        self.issue = Issue.objects.create(
+            title='Test Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        self.issue.assigned_users.add(self.user)
+
+    def request_permissions(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return get_permissions(request)
+
+    def test_loads_assigned_issues_and_projects_in_one_query(self):
+        with self.assertNumQueries(1):
+            permissions = load_permissions(self.user)
+        self.assertTrue(permissions.is_assigned_to_issue(self.issue))
+        self.assertTrue(permissions.is_assigned_to_project(self.project.pk))
+        self.assertFalse(load_permissions(self.other_user).is_assigned_to_issue(self.issue))
+
+    def test_request_loads_permissions_once(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(1):
+            self.assertIs(get_permissions(request), get_permissions(request))
+
+    def test_next_request_sees_assignment_changes(self):
+        self.assertFalse(self.request_permissions(self.other_user).is_assigned_to_project(self.project))
+        self.project.assigned_users.add(self.other_user)
+        self.assertTrue(self.request_permissions(self.other_user).is_assigned_to_project(self.project))
+        self.user.issues_assigned.remove(self.issue)
+        self.assertFalse(self.request_permissions(self.user).is_assigned_to_issue(self.issue))
+
+    def test_anonymous_users_have_no_permissions(self):
+        with self.assertNumQueries(0):
+            permissions = self.request_permissions(AnonymousUser())
+        self.assertFalse(permissions.is_assigned_to_issue(self.issue))
+
+    def test_close_issue_checks_the_permissions(self):
+        self.client.force_login(self.other_user)
+        self.client.post(f'/close_issue/{self.issue.id}')
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.issue_status, Issue.OPEN)
+
+        self.issue.assigned_users.add(self.other_user)
+        self.client.post(f'/close_issue/{self.issue.id}')
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.issue_status, Issue.CLOSED)
+
+    def test_issue_page_shows_actions_to_assigned_users_only(self):
+        self.client.force_login(self.other_user)
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.assertNotContains(response, 'Close Issue')
+        self.issue.assigned_users.add(self.other_user)
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.assertContains(response, 'Close Issue')
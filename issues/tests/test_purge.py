@@ -0,0 +1,203 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from issues.archive import archive_closed_issues, archive_cutoff
+from issues.models import Issue, Project, Comment, ArchivedIssue, ArchivedComment, VisitorSketch
+from issues.purge import mark_issue_deleted, mark_project_deleted, purge_batch, purge_deleted
+from issues.search import search
+from tasks.models import Job
+from tasks.queue import claim_job, run_job
+
+User = get_user_model()
+
+
+class PurgeTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        self.project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=self.user,
+            modified_by=self.user
+        )
+        self.project.assigned_users.add(self.user)
+
+    def create_issue(self, title='Test Issue', comments=0):
+        issue = Issue.objects.create(
+            title=title,
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        issue.assigned_users.add(self.user)
+        parent = None
+        for i in range(comments):
+            parent = Comment.objects.create(user=self.user, text=f'comment {i}', issue=issue, parent_comment=parent)
+        return issue
+
+    @override_settings(TASKS_EAGER=False)
+    def test_deleted_issue_is_hidden_until_purged(self):
+        issue = self.create_issue('Doomed gadget', comments=3)
+        self.create_issue('Survivor')
+        self.client.force_login(self.user)
+
+        response = self.client.post(f'/delete_issue/{issue.id}')
+        self.assertRedirects(response, f'/project_details/{self.project.id}')
+
+        self.assertFalse(Issue.objects.filter(id=issue.id).exists())
+        self.assertTrue(Issue.all_objects.filter(id=issue.id, pending_delete=True).exists())
+        self.assertEqual(Comment.objects.filter(issue_id=issue.id).count(), 3)
+        self.assertEqual(list(search('gadget')), [])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.issue_count, 1)
+
+        self.assertEqual(purge_deleted(), 4)
+        self.assertFalse(Issue.all_objects.filter(id=issue.id).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.issue_count, 1)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_deleted_project_hides_its_issues(self):
+        issue = self.create_issue(comments=2)
+        self.client.force_login(self.user)
+
+        response = self.client.post(f'/delete_project/{self.project.id}')
+        self.assertRedirects(response, f'/user_home/{self.user.pk}')
+
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(Issue.objects.exists())
+        self.assertFalse(self.user.projects_assigned.exists())
+        self.assertFalse(self.user.issues_assigned.exists())
+        self.assertEqual(Issue.all_objects.get().id, issue.id)
+
+        purge_deleted()
+        self.assertFalse(Project.all_objects.exists())
+        self.assertFalse(Issue.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_replies_of_deleted_issues_are_hidden(self):
+        issue = self.create_issue(comments=2)
+        thread = Comment.objects.get(issue=issue, parent_comment=None)
+        self.assertEqual(self.client.get(f'/comment_replies/{thread.id}').status_code, 200)
+
+        mark_issue_deleted(issue)
+        self.assertEqual(self.client.get(f'/comment_replies/{thread.id}').status_code, 404)
+
+    def test_replies_of_deleted_projects_are_hidden(self):
+        issue = self.create_issue(comments=2)
+        thread = Comment.objects.get(issue=issue, parent_comment=None)
+
+        mark_project_deleted(self.project)
+        self.assertEqual(self.client.get(f'/comment_replies/{thread.id}').status_code, 404)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_delete_views_queue_the_purge(self):
+        issue = self.create_issue(comments=1)
+        self.client.force_login(self.user)
+        self.client.post(f'/delete_issue/{issue.id}')
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.args), ('issues.tasks.purge_deleted_issue', [issue.id]))
+
+        self.assertTrue(run_job(claim_job()))
+        self.assertFalse(Issue.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=None, DEBUG=True, TASKS_EAGER=True)
+    def test_delete_views_purge_only_their_rows_in_development(self):
+        issue = self.create_issue(comments=2)
+        other_issue = self.create_issue('Marked elsewhere', comments=1)
+        mark_issue_deleted(other_issue)
+        other_project = Project.objects.create(
+            title='Other Project',
+            summary='This is a test project',
+            created_by=self.user,
+            modified_by=self.user
+        )
+        self.client.force_login(self.user)
+
+        response = self.client.post(f'/delete_issue/{issue.id}')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Issue.all_objects.filter(id=issue.id).exists())
+        self.assertTrue(Issue.all_objects.filter(id=other_issue.id).exists())
+        self.assertEqual(Comment.objects.count(), 1)
+
+        mark_project_deleted(other_project)
+        response = self.client.post(f'/delete_project/{self.project.id}')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Project.all_objects.all()), [other_project])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_purge_deletes_in_bounded_batches(self):
+        self.create_issue(comments=5)
+        self.create_issue(comments=5)
+        mark_project_deleted(self.project)
+
+        # replies go before their parents, so a batch never cascades
+        self.assertEqual(purge_batch(batch_size=3), 3)
+        self.assertEqual(Comment.objects.count(), 7)
+        self.assertEqual(purge_deleted(batch_size=3), 7 + 2 + 1)
+        self.assertEqual(purge_batch(batch_size=3), 0)
+
+    def test_purge_removes_archived_issues_of_deleted_projects(self):
+        issue = self.create_issue(comments=2)
+        Issue.objects.filter(id=issue.id).update(
+            issue_status=Issue.CLOSED, closed_on=timezone.now() - timedelta(days=100),
+        )
+        archive_closed_issues(archive_cutoff(90))
+        mark_project_deleted(self.project)
+
+        self.assertFalse(ArchivedIssue.objects.exists())
+        purge_deleted()
+        self.assertFalse(ArchivedIssue.all_objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+        self.assertFalse(Project.all_objects.exists())
+
+    def test_stale_save_does_not_undo_the_delete(self):
+        issue = self.create_issue()
+        stale = Issue.objects.get(id=issue.id)
+        mark_issue_deleted(issue)
+        stale.title = 'Edited meanwhile'
+        stale.save()
+        self.assertFalse(Issue.objects.exists())
+
+    def test_visits_to_deleted_issues_are_dropped(self):
+        issue = self.create_issue()
+        mark_issue_deleted(issue)
+        response = self.client.get(f'/issue_details/{issue.id}')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(VisitorSketch.objects.exists())
+
+    def test_command_reports_purged_rows(self):
+        issue = self.create_issue(comments=1)
+        mark_issue_deleted(issue)
+        out = StringIO()
+        call_command('purge_deleted', batch_size=1, stdout=out)
+        self.assertIn('Purged 2 rows', out.getvalue())
+
+    def test_hidden_rows_leave_the_search_index(self):
+        issue = self.create_issue('Zebra crossing', comments=2)
+        Comment.objects.filter(issue=issue).update(text='zebra sighting')
+        for comment in Comment.objects.filter(issue=issue):
+            comment.save()
+        archived = self.create_issue('Old zebra')
+        Issue.objects.filter(id=archived.id).update(
+            issue_status=Issue.CLOSED, closed_on=timezone.now() - timedelta(days=100),
+        )
+        archive_closed_issues(archive_cutoff(90))
+        self.assertEqual(len(search('zebra')), 2)
+
+        mark_issue_deleted(issue)
+        results = search('zebra')
+        self.assertEqual((len(results), list(results)), (1, [ArchivedIssue.objects.get()]))
+
+        mark_project_deleted(self.project)
+        results = search('zebra')
+        self.assertEqual((len(results), list(results)), (0, []))
@@ -0,0 +1,253 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import URLPattern, reverse
+
+from issues import urls
+from issues.models import Issue, Project, Comment
+from issues.middleware import QueryBudgetExceeded
+from issues.tests.base import QueryBudgetMixin
+from issues.views import IssueListView, ProjectListView, ProjectDetailView
+
+User = get_user_model()
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        self.other_user = User.objects.create(name='user2', email="user2@example.org", password="chondosha5563")
+        self.project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=self.user,
+            modified_by=self.user
+        )
+        self.project.assigned_users.add(self.user, self.other_user)
+        for i in range(15):
+            issue = Issue.objects.create(
+                title=f'Test Issue {i}',
+                project=self.project,
+                summary='This is a test issue',
+                issue_status=Issue.OPEN if i % 2 else Issue.CLOSED,
+                priority=i % 3 + 1,
+                created_by=self.user,
+                modified_by=self.user,
+                closed_by=None if i % 2 else self.user,
+            )
+            issue.assigned_users.add(self.user, self.other_user)
+        self.issue = issue
+        self.comment = Comment.objects.create(user=self.user, text='Test comment', issue=self.issue)
+        reply = Comment.objects.create(user=self.other_user, text='Test reply', issue=self.issue, parent_comment=self.comment)
+        Comment.objects.create(user=self.user, text='Test reply', issue=self.issue, parent_comment=reply)
+        Comment.objects.create(user=self.other_user, text='Another comment', issue=self.issue)
+        self.client.force_login(self.user)
+
+    def url_kwargs(self):
+        return {
+            'filter_term': None,
+            'issue_id': self.issue.id,
+            'project_id': self.project.id,
+            'comment_id': self.comment.id,
+            'parent_id': self.comment.id,
+            'user_id': self.user.pk,
+        }
+
+    def route_urls(self):
+        values = self.url_kwargs()
+        for pattern in urls.urlpatterns:
+            self.assertIsInstance(pattern, URLPattern)
+            names = list(pattern.pattern.converters)
+            kwargs = {name: values[name] for name in names}
+            if 'filter_term' in kwargs:
+                filter_terms = {
+                    'issue_list': ['recent', 'popular', 'open', 'closed'],
+                    'project_list': ['recent', 'popular'],
+                    'project_details': ['open', 'closed', 'priority'],
+                }[pattern.name]
+                for filter_term in filter_terms:
+                    yield reverse(f'issues:{pattern.name}', kwargs={**kwargs, 'filter_term': filter_term})
+            else:
+                yield reverse(f'issues:{pattern.name}', kwargs=kwargs)
+
+    def test_every_route_is_within_its_query_budget(self):
+        for url in self.route_urls():
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(url)
+
+    def test_anonymous_pages_are_within_their_query_budget(self):
+        self.client.logout()
+        for url in ['/issue_list', '/project_list', f'/issue_details/{self.issue.id}',
+                    f'/project_details/{self.project.id}', '/search?search_query=test']:
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(url)
+
+    def test_form_posts_are_within_their_query_budget(self):
+        self.assertWithinQueryBudget(f'/add_comment/{self.issue.id}', 'post', {'text': 'New comment'})
+        self.assertWithinQueryBudget(
+            f'/reply_comment/{self.issue.id}/{self.comment.id}', 'post', {'text': 'New reply'}
+        )
+        self.assertWithinQueryBudget(f'/edit_comment/{self.comment.id}', 'post', {'text': 'Edited comment'})
+        self.assertWithinQueryBudget(f'/open_issue/{self.issue.id}', 'post')
+        self.assertWithinQueryBudget(f'/close_issue/{self.issue.id}', 'post')
+        self.assertWithinQueryBudget(
+            f'/update_issue/{self.issue.id}', 'post',
+            {'title': 'Updated issue', 'summary': 'Updated summary', 'priority': 2},
+        )
+        self.assertWithinQueryBudget(
+            f'/update_project/{self.project.id}', 'post',
+            {'title': 'Updated project', 'summary': 'Updated summary'},
+        )
+        self.assertWithinQueryBudget(
+            f'/create_issue/{self.project.id}', 'post',
+            {'title': 'New issue', 'summary': 'New summary', 'priority': 1},
+        )
+        self.assertWithinQueryBudget('/create_project', 'post', {'title': 'New project', 'summary': 'New summary'})
+        self.assertWithinQueryBudget(f'/remove_user_from_issue/{self.issue.id}', 'post', {'username': 'user2'})
+        self.assertWithinQueryBudget(f'/add_user_to_issue/{self.issue.id}', 'post', {'username': 'user2'})
+        self.assertWithinQueryBudget(f'/remove_user_from_project/{self.project.id}', 'post', {'username': 'user2'})
+        self.assertWithinQueryBudget(f'/add_user_to_project/{self.project.id}', 'post', {'username': 'user2'})
+        self.assertWithinQueryBudget(f'/delete_comment/{self.comment.id}', 'post')
+        self.assertWithinQueryBudget(f'/delete_issue/{self.issue.id}', 'post')
+        self.assertWithinQueryBudget(f'/delete_project/{self.project.id}', 'post')
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=True, DEBUG=True, QUERY_BUDGETS={'issues:issue_list': 0})
+    def test_raises_over_budget_in_debug(self):
+        with self.assertLogs('django.request', 'ERROR'), self.assertLogs('issues.middleware', 'WARNING'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/issue_list')
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=True, DEBUG=False, QUERY_BUDGETS={'issues:issue_list': 0})
+    def test_logs_over_budget_without_debug(self):
+        with self.assertLogs('issues.middleware', 'WARNING') as logs:
+            response = self.client.get('/issue_list')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('issues:issue_list', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=None, DEBUG=True, QUERY_BUDGETS={})
+    def test_follows_debug_by_default(self):
+        with self.assertLogs('issues.middleware', 'INFO'):
+            self.client.get('/project_list')
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=None, DEBUG=False, QUERY_BUDGETS={'issues:project_list': 0})
+    def test_is_left_out_of_test_runs(self):
+        with self.assertNoLogs('issues.middleware'):
+            response = self.client.get('/project_list')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=None, DEBUG=True, VISIT_COUNTER_FLUSH_INTERVAL=0)
+    def test_detail_pages_stay_within_budget_in_development(self):
+        # visits are written through in development, the flush is not the view's cost
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = Project.objects.create(
+            title='Test Project',
+            summary='This is a test project',
+            created_by=user,
+            modified_by=user
+        )
+        project.assigned_users.add(user)
+        issue = Issue.objects.create(
+            title='Test Issue',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        issue.assigned_users.add(user)
+        Comment.objects.create(user=user, text='Test comment', issue=issue)
+
+        for logged_in in (False, True):
+            if logged_in:
+                self.client.force_login(user)
+            for url in [f'/issue_details/{issue.id}', f'/project_details/{project.id}']:
+                with self.assertLogs('issues.middleware', 'INFO') as logs:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+                self.assertNotIn(' 0 deferred)', logs.output[0])
+        self.assertEqual(Issue.objects.get(id=issue.id).visits, 2)
+
+    @override_settings(QUERY_BUDGET_MIDDLEWARE=True, DEBUG=True, QUERY_BUDGETS={})
+    def test_logs_query_count_of_every_request(self):
+        with self.assertLogs('issues.middleware', 'INFO') as logs:
+            self.client.get('/project_list')
+        self.assertRegex(logs.output[0], r'GET issues:project_list: \d+ queries in [\d.]+ms')
+
+
+class ConstantQueryCountTest(QueryBudgetMixin, TestCase):
+    # pages cost the same number of queries however many rows they show
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create(name=f'user{i}', email=f"user{i}@example.org", password="chondosha5563")
+            for i in range(10)
+        ]
+        cls.user = users[0]
+        projects = [
+            Project.objects.create(
+                title=f'Test Project {i}',
+                summary='This is a test project',
+                created_by=users[i % 10],
+                modified_by=users[-i % 10],
+            )
+            for i in range(30)
+        ]
+        cls.project = projects[0]
+        for i in range(500):
+            Issue.objects.create(
+                title=f'Test Issue {i}',
+                project=projects[i % 10],
+                summary='This is a test issue',
+                issue_status=Issue.OPEN if i // 10 % 2 else Issue.CLOSED,
+                priority=i % 3 + 1,
+                created_by=users[i % 10],
+                modified_by=users[(i + 3) % 10],
+                closed_by=None if i // 10 % 2 else users[(i + 7) % 10],
+                visits=i,
+            )
+        cls.issue = Issue.objects.first()
+        cls.issue.assigned_users.add(*users)
+        cls.project.assigned_users.add(*users)
+        for i in range(50):
+            Comment.objects.create(user=users[i % 10], text=f'Test comment {i}', issue=cls.issue)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertConstantQueries(self, url, view_class, page=5):
+        queries = self.count_queries(url)
+        self.assertEqual(self.count_queries(f'{url}?page={page}'), queries, url)
+        with patch.object(view_class, 'paginate_by', 100):
+            self.assertEqual(self.count_queries(url), queries, f'{url} with 100 rows a page')
+        self.assertWithinQueryBudget(url)
+
+    def test_issue_list_query_count_is_constant(self):
+        for filter_term in ['', '/recent', '/popular', '/open', '/closed']:
+            self.assertConstantQueries('/issue_list' + filter_term, IssueListView)
+
+    def test_project_list_query_count_is_constant(self):
+        for filter_term in ['', '/recent', '/popular']:
+            self.assertConstantQueries('/project_list' + filter_term, ProjectListView, page=2)
+
+    def test_project_details_query_count_is_constant(self):
+        for filter_term in ['', '/open', '/closed', '/priority']:
+            self.assertConstantQueries(f'/project_details/{self.project.id}{filter_term}', ProjectDetailView, page=2)
+
+    def test_search_query_count_is_constant(self):
+        queries = self.count_queries('/search?search_query=issue')
+        self.assertEqual(self.count_queries('/search?search_query=issue&page=20'), queries)
+        self.assertWithinQueryBudget('/search?search_query=issue')
+
+    def test_issue_details_query_count_does_not_grow_with_comments(self):
+        other_issue = Issue.objects.last()
+        Comment.objects.create(user=self.user, text='Test comment', issue=other_issue)
+        other_issue.assigned_users.add(self.user)
+        self.assertEqual(
+            self.count_queries(f'/issue_details/{self.issue.id}'),
+            self.count_queries(f'/issue_details/{other_issue.id}'),
+        )
+        self.assertWithinQueryBudget(f'/issue_details/{self.issue.id}')
@@ -0,0 +1,92 @@
+import re
+from unittest import skipUnless
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from issues.models import Issue, Project, Comment
+
+User = get_user_model()
+
+LIST_TABLES = ('issues_issue', 'issues_project')
+COMMENT_TABLES = ('issues_comment',)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class ListQueryPlanTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        self.project = Project.objects.create(
+            title="Test Project",
+            summary="This is a test project",
+            created_by=user,
+            modified_by=user
+        )
+        for i in range(20):
+            Issue.objects.create(
+                title=f"Test {i}",
+                project=self.project,
+                summary="This is a test issue",
+                issue_status=Issue.OPEN if i % 2 else Issue.CLOSED,
+                priority=i % 3 + 1,
+                created_by=user,
+                modified_by=user,
+                visits=i,
+            )
+
+    def query_plans(self, url, tables=LIST_TABLES):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        plans = {}
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not re.search(r'FROM "(%s)"' % '|'.join(tables), sql):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans[sql] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def assertUsesIndexes(self, url, tables=LIST_TABLES):
+        for sql, plan in self.query_plans(url, tables).items():
+            for step in plan:
+                for table in tables:
+                    self.assertNotRegex(step, rf'^SCAN {table}$', f'{url} scans {table}:\n{sql}')
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', step, f'{url} sorts without an index:\n{sql}')
+
+    def test_issue_list_queries_use_indexes(self):
+        for url in ['/issue_list', '/issue_list/recent', '/issue_list/popular',
+                    '/issue_list/open', '/issue_list/closed']:
+            self.assertUsesIndexes(url)
+            self.assertUsesIndexes(url + '?cursor=')
+
+    def test_project_list_queries_use_indexes(self):
+        for url in ['/project_list', '/project_list/recent', '/project_list/popular']:
+            self.assertUsesIndexes(url)
+            self.assertUsesIndexes(url + '?cursor=')
+
+    def test_project_detail_queries_use_indexes(self):
+        for filter_term in ['', '/open', '/closed', '/priority']:
+            url = f'/project_details/{self.project.id}{filter_term}'
+            self.assertUsesIndexes(url)
+            self.assertUsesIndexes(url + '?cursor=')
+
+    def test_comment_queries_use_indexes(self):
+        user = User.objects.get(name='chondosha')
+        issue = Issue.objects.first()
+        for i in range(5):
+            parent = Comment.objects.create(user=user, text=f'top {i}', issue=issue)
+            for j in range(5):
+                Comment.objects.create(user=user, text=f'reply {j}', issue=issue, parent_comment=parent, depth=1)
+        with self.settings(COMMENT_THREADS_PER_PAGE=2, COMMENT_INLINE_REPLIES=2, COMMENT_REPLIES_PER_PAGE=2):
+            response = self.client.get(f'/issue_details/{issue.id}')
+            self.assertUsesIndexes(f'/issue_details/{issue.id}', COMMENT_TABLES)
+            self.assertUsesIndexes(f'/issue_comments/{issue.id}?cursor={response.context["comments_cursor"]}', COMMENT_TABLES)
+            self.assertUsesIndexes(f'/comment_replies/{parent.id}', COMMENT_TABLES)
@@ -0,0 +1,69 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from issues.search import SearchResults, search_index_available, reset_search_index_available
+
+
+class RecordingSource:
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.fetches = []
+
+    def count(self):
+        return self.size
+
+    def fetch(self, offset, limit):
+        self.fetches.append((offset, limit))
+        return [(self.name, i) for i in range(offset, min(offset + limit, self.size))]
+
+
+class SearchResultsTest(TestCase):
+
+    def test_slice_inside_one_source_only_fetches_that_slice(self):
+        projects = RecordingSource('project', 5)
+        issues = RecordingSource('issue', 20)
+        users = RecordingSource('user', 3)
+        results = SearchResults([projects, issues, users])
+
+        page = results[8:18]
+        self.assertEqual(page, [('issue', i) for i in range(3, 13)])
+        self.assertEqual(projects.fetches, [])
+        self.assertEqual(issues.fetches, [(3, 10)])
+        self.assertEqual(users.fetches, [])
+
+    def test_slice_spanning_sources(self):
+        projects = RecordingSource('project', 5)
+        issues = RecordingSource('issue', 20)
+        users = RecordingSource('user', 3)
+        results = SearchResults([projects, issues, users])
+
+        page = results[20:30]
+        self.assertEqual(page, [('issue', 15 + i) for i in range(5)] + [('user', i) for i in range(3)])
+        self.assertEqual(issues.fetches, [(15, 5)])
+        self.assertEqual(users.fetches, [(0, 3)])
+
+    def test_count_and_index(self):
+        results = SearchResults([RecordingSource('project', 2), RecordingSource('issue', 1)])
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[2], ('issue', 0))
+        self.assertEqual(results[-1], ('issue', 0))
+        with self.assertRaises(IndexError):
+            results[3]
+
+
+class SearchIndexAvailableTest(TestCase):
+
+    def test_table_is_looked_up_once_per_connection(self):
+        reset_search_index_available(connection)
+        with CaptureQueriesContext(connection) as queries:
+            available = search_index_available()
+            self.assertEqual(search_index_available(), available)
+        self.assertEqual(len(queries), 1 if connection.vendor == 'sqlite' else 0)
+
+        reset_search_index_available(connection)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(search_index_available(), available)
+        self.assertEqual(len(queries), 1 if connection.vendor == 'sqlite' else 0)
@@ -1,12 +1,22 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import resolve
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
 import time
 import datetime
+from unittest.mock import patch
+from io import StringIO
 
 from issues.views import home_page, IssueListView, get_sidebar_context
-from issues.models import Issue, Project, Comment
+from issues.counters import VisitCounter, visit_counter, hotness_weight
+from issues.models import Issue, Project, Comment, VisitorSketch
+from issues.hyperloglog import HyperLogLog
+from issues.sidebar import sidebar_key
 from issues.forms import (
     CreateProjectForm, CreateIssueForm,
     UpdateProjectForm, UpdateIssueForm
@@ -95,7 +105,7 @@ class SearchTest(TestCase):
         other_issue = Issue.objects.create(
             title='Other Issue',
             project=project,
-            summary='This is a test issue',
+            summary='This is another issue',
             created_by=user,
             modified_by=user,
         )
@@ -112,7 +122,7 @@ class SearchTest(TestCase):
         )
         other_project = Project.objects.create(
             title='Other Project',
-            summary='This is a test project',
+            summary='This is another project',
             created_by=user,
             modified_by=user
         )
@@ -160,6 +170,92 @@ class SearchTest(TestCase):
         self.assertEquals(response.context['results'][0], project)
         self.assertEquals(response.context['results'][1], issue)
 
+    def test_search_matches_issue_summary_and_comments(self):
+        project = self.create_test_project()
+        user = User.objects.get(email='user1234@example.org')
+        summary_issue = Issue.objects.create(
+            title='First',
+            project=project,
+            summary='The login page crashes',
+            created_by=user,
+            modified_by=user,
+        )
+        comment_issue = Issue.objects.create(
+            title='Second',
+            project=project,
+            summary='Something else',
+            created_by=user,
+            modified_by=user,
+        )
+        Comment.objects.create(user=user, text='Seeing a crash here too', issue=comment_issue)
+        response = self.client.get('/search', data={'search_query': 'crash'})
+        self.assertEquals(list(response.context['results']), [summary_issue, comment_issue])
+
+    def test_search_ranks_title_matches_first(self):
+        project = self.create_test_project()
+        user = User.objects.get(email='user1234@example.org')
+        summary_issue = Issue.objects.create(
+            title='First',
+            project=project,
+            summary='Mentions the parser once',
+            created_by=user,
+            modified_by=user,
+        )
+        title_issue = Issue.objects.create(
+            title='Parser fails',
+            project=project,
+            summary='Something else',
+            created_by=user,
+            modified_by=user,
+        )
+        response = self.client.get('/search', data={'search_query': 'parser'})
+        self.assertEquals(list(response.context['results']), [title_issue, summary_issue])
+
+    def test_search_index_follows_edits_and_deletes(self):
+        project = self.create_test_project()
+        user = User.objects.get(email='user1234@example.org')
+        issue = Issue.objects.create(
+            title='Old title',
+            project=project,
+            summary='Nothing',
+            created_by=user,
+            modified_by=user,
+        )
+        issue.title = 'New title'
+        issue.save()
+        response = self.client.get('/search', data={'search_query': 'Old'})
+        self.assertEquals(len(response.context['results']), 0)
+        response = self.client.get('/search', data={'search_query': 'New'})
+        self.assertEquals(list(response.context['results']), [issue])
+
+        issue.delete()
+        response = self.client.get('/search', data={'search_query': 'New'})
+        self.assertEquals(len(response.context['results']), 0)
+
+    def test_search_falls_back_to_title_lookup_without_index(self):
+        project = self.create_test_project()
+        with patch('issues.search.search_index_available', return_value=False):
+            response = self.client.get('/search', data={'search_query': 'est Proj'})
+        self.assertEquals(list(response.context['results']), [project])
+
+    def test_search_results_are_paginated_across_models(self):
+        project = self.create_test_project()
+        user = User.objects.get(email='user1234@example.org')
+        for i in range(12):
+            Issue.objects.create(
+                title=f'Test Issue {i}',
+                project=project,
+                summary='This is a test issue',
+                created_by=user,
+                modified_by=user,
+            )
+        response = self.client.get('/search', data={'search_query': 'Test', 'page': 2})
+        page = response.context['page_obj']
+        self.assertEquals(response.context['paginator'].count, 13)
+        self.assertEquals(len(page.object_list), 3)
+        self.assertTrue(all(isinstance(item, Issue) for item in page.object_list))
+        self.assertContains(response, '?search_query=Test&amp;page=1')
+
 
 class UserHomeTest(TestCase):
 
@@ -240,6 +336,32 @@ class IssueListTest(TestCase):
         response = self.client.get("/issue_list/popular")
         self.assertEquals(response.context['issue_list'][0], issue2)
 
+    def test_list_popular_ranks_recent_visits_above_old_ones(self):
+        project = self.create_test_project()
+        user = User.objects.get(email="user1234@example.org")
+        month_ago = timezone.now() - datetime.timedelta(days=30)
+        old_issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+            visits=100,
+            hotness=100 * hotness_weight(month_ago),
+        )
+        new_issue = Issue.objects.create(
+            title="Test2",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        self.client.get(f'/issue_details/{new_issue.id}')
+        self.client.get(f'/issue_details/{new_issue.id}')
+
+        response = self.client.get("/issue_list/popular")
+        self.assertEquals(list(response.context['issue_list']), [new_issue, old_issue])
+
     def test_list_open_only_shows_open_issues(self):
         project = self.create_test_project()
         user = User.objects.get(email="user1234@example.org")
@@ -247,7 +369,7 @@ class IssueListTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
             visits=0
@@ -272,7 +394,7 @@ class IssueListTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
             visits=0
@@ -290,6 +412,28 @@ class IssueListTest(TestCase):
         self.assertEquals(response.context['issue_list'].count(), 1)
         self.assertEquals(response.context['issue_list'][0], issue1)
 
+    def test_list_shows_status_labels(self):
+        project = self.create_test_project()
+        user = User.objects.get(email="user1234@example.org")
+        Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            issue_status=Issue.CLOSED,
+            created_by=user,
+            modified_by=user,
+        )
+        Issue.objects.create(
+            title="Test2",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        response = self.client.get("/issue_list")
+        self.assertContains(response, '<span style="color: green;">Open</span>')
+        self.assertContains(response, '<span style="color: red;">Closed</span>')
+
 
 class IssueDetailTest(TestCase):
 
@@ -300,12 +444,13 @@ class IssueDetailTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
         response = self.client.get(f'/issue_details/{issue.id}')
-        self.assertEquals(response.templates[0].name, 'issue_details.html')
+        # the comment tree is rendered on its own before the page
+        self.assertEquals(response.template_name, ['issue_details.html'])
         self.assertTemplateUsed(response, 'issue_details.html')
 
 
@@ -316,7 +461,7 @@ class IssueDetailTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -332,7 +477,7 @@ class IssueDetailTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -345,6 +490,265 @@ class IssueDetailTest(TestCase):
         issue_timezone = changed_issue.last_visit.tzinfo
         self.assertAlmostEqual(changed_issue.last_visit, datetime.datetime.now(issue_timezone), delta=datetime.timedelta(seconds=1))
 
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_visits_are_buffered_until_flushed(self):
+        visit_counter.clear()
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            issue_status=Issue.OPEN,
+            created_by=user,
+            modified_by=user,
+        )
+        self.client.get(f'/issue_details/{issue.id}')
+        self.client.get(f'/issue_details/{issue.id}')
+        self.assertEqual(Issue.objects.get(id=issue.id).visits, 0)
+
+        visit_counter.flush()
+        changed_issue = Issue.objects.get(id=issue.id)
+        self.assertEqual(changed_issue.visits, 2)
+        # both visits came from the same visitor
+        self.assertAlmostEqual(changed_issue.hotness / hotness_weight(timezone.now()), 1, places=3)
+        self.assertEqual(changed_issue.modified_on, issue.modified_on)
+
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_failed_flush_keeps_the_visits(self):
+        visit_counter.clear()
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        self.client.get(f'/issue_details/{issue.id}')
+        with patch.object(visit_counter, 'merge_sketches', side_effect=DatabaseError):
+            with self.assertLogs('issues.counters', 'ERROR'):
+                self.assertEqual(visit_counter.flush_logged(), 0)
+        self.client.get(f'/issue_details/{issue.id}')
+        self.assertEqual(visit_counter.pending_count(Issue, issue.id), 2)
+
+        visit_counter.flush()
+        self.assertEqual(Issue.objects.get(id=issue.id).visits, 2)
+
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_idle_buffer_is_flushed_after_the_interval(self):
+        visit_counter.clear()
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        self.client.get(f'/project_details/{project.id}')
+        self.assertTrue(visit_counter.timer.is_alive())
+        self.assertEqual(visit_counter.flush_if_due(), 0)
+
+        visit_counter.last_flush -= 60
+        self.assertEqual(visit_counter.flush_if_due(), 1)
+        self.assertEqual(Project.objects.get(id=project.id).visits, 1)
+
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_flush_visits_command_asks_the_workers_to_flush(self):
+        visit_counter.clear()
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        self.client.get(f'/project_details/{project.id}')
+        self.assertEqual(visit_counter.flush_if_due(), 0)
+
+        # the command runs in its own process, with its own empty buffer
+        out = StringIO()
+        with patch('issues.management.commands.flush_visits.visit_counter', VisitCounter()):
+            call_command('flush_visits', stdout=out)
+        self.assertIn('Asked the workers to flush', out.getvalue())
+        self.assertEqual(Project.objects.get(id=project.id).visits, 0)
+
+        self.assertEqual(visit_counter.flush_if_due(), 1)
+        self.assertEqual(Project.objects.get(id=project.id).visits, 1)
+        # the request was handled
+        self.client.get(f'/project_details/{project.id}')
+        self.assertEqual(visit_counter.flush_if_due(), 0)
+
+    def test_comment_tree_is_built_with_replies_and_reply_counts(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        comment1 = Comment.objects.create(user=user, text='top', issue=issue)
+        comment2 = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=comment1, depth=1)
+        comment3 = Comment.objects.create(user=user, text='nested reply', issue=issue, parent_comment=comment2, depth=2)
+        comment4 = Comment.objects.create(user=user, text='other top', issue=issue)
+
+        response = self.client.get(f'/issue_details/{issue.id}')
+        comment_list = response.context['comment_list']
+        self.assertEqual(comment_list, [comment1, comment4])
+        self.assertEqual(comment_list[0].children, [comment2])
+        self.assertEqual(comment_list[0].descendant_count, 2)
+        self.assertEqual(comment_list[0].children[0].descendant_count, 1)
+        self.assertEqual(comment_list[1].descendant_count, 0)
+        # replies below the first level are loaded on demand
+        self.assertEqual(comment_list[0].children[0].children, [])
+        self.assertEqual(comment_list[0].children[0].replies_cursor, '')
+        self.assertContains(response, f'/comment_replies/{comment2.id}"')
+
+        response = self.client.get(f'/comment_replies/{comment2.id}')
+        self.assertEqual(response.context['comment_list'], [comment3])
+        self.assertContains(response, 'nested reply')
+
+    def test_edit_forms_are_built_for_the_viewers_comments_only(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        other_user = User.objects.create(name='user2', email="user2@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        own_comment = Comment.objects.create(user=user, text='mine', issue=issue)
+        other_comment = Comment.objects.create(user=other_user, text='theirs', issue=issue)
+        self.client.force_login(user)
+
+        response = self.client.get(f'/issue_details/{issue.id}')
+        self.assertEqual(list(response.context['edit_forms']), [own_comment.id])
+        self.assertContains(response, f'/edit_comment/{own_comment.id}')
+        self.assertNotContains(response, f'/edit_comment/{other_comment.id}')
+
+    def test_issue_page_has_one_reply_form(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        for i in range(5):
+            Comment.objects.create(user=user, text=f'comment {i}', issue=issue)
+        self.client.force_login(user)
+
+        response = self.client.get(f'/issue_details/{issue.id}')
+        self.assertContains(response, 'id="reply-form"', count=1)
+        self.assertContains(response, 'id="reply-link-', count=5)
+        # the comment form, the reply form and one edit and delete form per comment
+        self.assertContains(response, 'csrfmiddlewaretoken', count=2 + 5 * 2)
+
+    def test_comment_tree_query_count_does_not_grow_with_comments(self):
+        user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(user)
+        issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=user,
+            modified_by=user,
+        )
+        parent = Comment.objects.create(user=user, text='top', issue=issue)
+        parent = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=parent, depth=1)
+        self.client.get(f'/issue_details/{issue.id}')
+
+        with CaptureQueriesContext(connection) as small_thread:
+            self.client.get(f'/issue_details/{issue.id}')
+
+        for i in range(20):
+            parent = Comment.objects.create(user=user, text='reply', issue=issue, parent_comment=parent, depth=i + 2)
+
+        with CaptureQueriesContext(connection) as large_thread:
+            self.client.get(f'/issue_details/{issue.id}')
+
+        self.assertEqual(len(small_thread), len(large_thread))
+
+
+@override_settings(COMMENT_THREADS_PER_PAGE=2, COMMENT_INLINE_REPLIES=2, COMMENT_REPLIES_PER_PAGE=2)
+class CommentPaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email="user1234@example.org", password="chondosha5563")
+        project = create_test_project(self.user)
+        self.issue = Issue.objects.create(
+            title="Test",
+            project=project,
+            summary="This is a test issue",
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        self.threads = [Comment.objects.create(user=self.user, text=f'thread {i}', issue=self.issue) for i in range(5)]
+        self.replies = [
+            Comment.objects.create(user=self.user, text=f'reply {i}', issue=self.issue, parent_comment=self.threads[0], depth=1)
+            for i in range(5)
+        ]
+
+    def test_issue_page_renders_the_first_threads_and_replies(self):
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        comment_list = response.context['comment_list']
+        self.assertEqual(comment_list, self.threads[:2])
+        self.assertEqual(comment_list[0].children, self.replies[:2])
+        self.assertEqual(comment_list[0].descendant_count, 5)
+        self.assertNotContains(response, 'thread 2')
+        self.assertNotContains(response, 'reply 2')
+        self.assertContains(response, 'More comments')
+        self.assertContains(response, 'More replies')
+
+    def test_more_comments_continue_after_the_cursor(self):
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        cursor = response.context['comments_cursor']
+
+        response = self.client.get(f'/issue_comments/{self.issue.id}', {'cursor': cursor})
+        self.assertTemplateUsed(response, 'comment_fragment.html')
+        self.assertEqual(response.context['comment_list'], self.threads[2:4])
+        self.assertContains(response, 'More comments')
+
+        response = self.client.get(f'/issue_comments/{self.issue.id}', {'cursor': response.context['more_cursor']})
+        self.assertEqual(response.context['comment_list'], self.threads[4:])
+        self.assertNotContains(response, 'More comments')
+
+    def test_more_replies_continue_after_the_inline_replies(self):
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        cursor = response.context['comment_list'][0].replies_cursor
+
+        response = self.client.get(f'/comment_replies/{self.threads[0].id}', {'cursor': cursor})
+        self.assertEqual(response.context['comment_list'], self.replies[2:4])
+        response = self.client.get(f'/comment_replies/{self.threads[0].id}', {'cursor': response.context['more_cursor']})
+        self.assertEqual(response.context['comment_list'], self.replies[4:])
+        self.assertNotContains(response, 'More replies')
+
+    def test_comments_with_the_same_timestamp_are_paged_by_id(self):
+        Comment.objects.filter(issue=self.issue).update(created_at=timezone.now())
+        response = self.client.get(f'/comment_replies/{self.threads[0].id}')
+        seen = list(response.context['comment_list'])
+        while 'more_cursor' in response.context:
+            response = self.client.get(f'/comment_replies/{self.threads[0].id}', {'cursor': response.context['more_cursor']})
+            seen.extend(response.context['comment_list'])
+        self.assertEqual(seen, self.replies)
+
+    def test_fragments_have_edit_forms_for_the_viewers_comments(self):
+        self.client.force_login(self.user)
+        response = self.client.get(f'/comment_replies/{self.threads[0].id}')
+        self.assertContains(response, f'/edit_comment/{self.replies[0].id}')
+        self.assertContains(response, f'id="reply-link-{self.replies[0].id}"')
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(f'/issue_comments/{self.issue.id}', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f'/comment_replies/{self.threads[0].id}', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_issue_comments_return_404(self):
+        response = self.client.get(f'/issue_comments/{self.issue.id + 1}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_comment_replies_return_404(self):
+        response = self.client.get(f'/comment_replies/{self.replies[-1].id + 1}')
+        self.assertEqual(response.status_code, 404)
+
 
 class ProjectListViewTest(TestCase):
 
@@ -477,7 +881,7 @@ class ProjectDetailViewTest(TestCase):
             title="Test",
             project=project,
             summary="This is a test issue",
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
         )
@@ -497,6 +901,18 @@ class ProjectDetailViewTest(TestCase):
         changed_project = Project.objects.get(id=project.id)
         self.assertEqual(changed_project.visits, 1)
 
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_visits_are_buffered_until_flushed(self):
+        visit_counter.clear()
+        project = self.create_test_project()
+        self.client.get(f'/project_details/{project.id}')
+        self.assertEqual(Project.objects.get(id=project.id).visits, 0)
+
+        visit_counter.flush()
+        changed_project = Project.objects.get(id=project.id)
+        self.assertEqual(changed_project.visits, 1)
+        self.assertEqual(changed_project.modified_on, project.modified_on)
+
 
 class CreateProjectTest(TestCase):
 
@@ -937,7 +1353,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
         )
@@ -947,7 +1363,7 @@ class OpenAndCloseIssueTest(TestCase):
 
         response = self.client.post(f'/open_issue/{issue.id}')
         changed_issue = Issue.objects.get(id=issue.id)
-        self.assertEqual(changed_issue.issue_status, 'Open')
+        self.assertEqual(changed_issue.issue_status, Issue.OPEN)
 
     def test_POST_on_open_issue_does_nothing(self):
         user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
@@ -956,7 +1372,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -966,7 +1382,7 @@ class OpenAndCloseIssueTest(TestCase):
 
         response = self.client.post(f'/open_issue/{issue.id}')
         changed_issue = Issue.objects.get(id=issue.id)
-        self.assertEqual(changed_issue.issue_status, 'Open')
+        self.assertEqual(changed_issue.issue_status, Issue.OPEN)
 
     def test_open_issue_removes_closed_by_user_on_issue(self):
         user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
@@ -975,7 +1391,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
             closed_by=user
@@ -1011,7 +1427,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -1021,7 +1437,7 @@ class OpenAndCloseIssueTest(TestCase):
 
         response = self.client.post(f'/close_issue/{issue.id}')
         changed_issue = Issue.objects.get(id=issue.id)
-        self.assertEqual(changed_issue.issue_status, 'Closed')
+        self.assertEqual(changed_issue.issue_status, Issue.CLOSED)
 
     def test_POST_on_closed_issue_does_nothing(self):
         user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
@@ -1030,7 +1446,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Closed',
+            issue_status=Issue.CLOSED,
             created_by=user,
             modified_by=user,
         )
@@ -1040,7 +1456,7 @@ class OpenAndCloseIssueTest(TestCase):
 
         response = self.client.post(f'/close_issue/{issue.id}')
         changed_issue = Issue.objects.get(id=issue.id)
-        self.assertEqual(changed_issue.issue_status, 'Closed')
+        self.assertEqual(changed_issue.issue_status, Issue.CLOSED)
 
     def test_close_issue_adds_user_as_closed_by_on_issue(self):
         user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
@@ -1049,7 +1465,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -1069,7 +1485,7 @@ class OpenAndCloseIssueTest(TestCase):
             title='Test',
             project=project,
             summary='This is a test issue',
-            issue_status='Open',
+            issue_status=Issue.OPEN,
             created_by=user,
             modified_by=user,
         )
@@ -1245,11 +1661,433 @@ class SideBarContextTest(TestCase):
         last_issue.visits = 3
         first_issue.visits = 1
 
-        last_issue.save()
-        first_issue.save()
+        last_issue.save(update_fields=['visits'])
+        first_issue.save(update_fields=['visits'])
 
         context = {}
         get_sidebar_context(AnonymousUser(), context)
         issue_list = context['issue_sidebar_list']
         self.assertIn(last_issue, issue_list)
         self.assertNotIn(first_issue, issue_list)
+
+    def test_sidebar_is_cached_per_user(self):
+        cache.clear()
+        user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        project = create_test_project(user)
+        project.assigned_users.add(user)
+
+        get_sidebar_context(user, {})
+        with self.assertNumQueries(0):
+            context = {}
+            get_sidebar_context(user, context)
+        self.assertEqual(context['project_sidebar_list'], [project])
+        self.assertEqual(context['project_sidebar_list'][0].issue_count, 0)
+
+    def test_sidebar_cache_is_invalidated_by_changes(self):
+        cache.clear()
+        user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        project = create_test_project(user)
+        project.assigned_users.add(user)
+        get_sidebar_context(user, {})
+
+        issue = Issue.objects.create(
+            title='Test',
+            project=project,
+            summary='This is a test issue',
+            created_by=user,
+            modified_by=user,
+        )
+        context = {}
+        get_sidebar_context(user, context)
+        self.assertEqual(context['issue_sidebar_list'], [])
+        self.assertEqual(context['project_sidebar_list'][0].issue_count, 1)
+
+        issue.assigned_users.add(user)
+        context = {}
+        get_sidebar_context(user, context)
+        self.assertEqual(context['issue_sidebar_list'], [issue])
+
+    def test_changes_only_invalidate_the_sidebars_that_list_them(self):
+        cache.clear()
+        user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        other_user = User.objects.create(name='user2', email='user2@example.org', password='chondosha5563')
+        project = create_test_project(user)
+        project.assigned_users.add(user)
+        other_project = create_test_project(other_user)
+        other_project.assigned_users.add(other_user)
+        get_sidebar_context(user, {})
+        get_sidebar_context(other_user, {})
+
+        Issue.objects.create(
+            title='Test',
+            project=other_project,
+            summary='This is a test issue',
+            created_by=other_user,
+            modified_by=other_user,
+        )
+        with self.assertNumQueries(0):
+            get_sidebar_context(user, {})
+        context = {}
+        get_sidebar_context(other_user, context)
+        self.assertEqual(context['project_sidebar_list'][0].issue_count, 1)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        self.project = create_test_project(self.user)
+        self.issue = Issue.objects.create(
+            title='Test Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        for url in ['/issue_list', '/issue_list/recent', '/project_list',
+                    f'/project_details/{self.project.id}', f'/issue_details/{self.issue.id}']:
+            response = self.client.get(url)
+            with override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60):
+                with self.assertNumQueries(0):
+                    cached_response = self.client.get(url)
+            visit_counter.clear()
+            self.assertEqual(cached_response.content, response.content)
+
+    def test_pages_are_cached_per_page_number(self):
+        self.client.get('/issue_list')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/issue_list?page=2')
+        self.assertNotEqual(len(queries), 0)
+
+    def test_logged_in_users_are_not_served_cached_pages(self):
+        self.client.get('/issue_list')
+        self.client.force_login(self.user)
+        response = self.client.get('/issue_list')
+        self.assertContains(response, 'Your recent issues')
+
+    def test_issue_change_invalidates_list_and_detail_pages(self):
+        self.client.get('/issue_list')
+        self.client.get(f'/issue_details/{self.issue.id}')
+
+        self.issue.title = 'Renamed Issue'
+        self.issue.save()
+
+        self.assertContains(self.client.get('/issue_list'), 'Renamed Issue')
+        self.assertContains(self.client.get(f'/issue_details/{self.issue.id}'), 'Renamed Issue')
+
+    def test_comment_only_invalidates_its_issue_page(self):
+        self.client.get('/issue_list')
+        self.client.get(f'/issue_details/{self.issue.id}')
+
+        Comment.objects.create(user=self.user, text='A new comment', issue=self.issue)
+
+        self.assertContains(self.client.get(f'/issue_details/{self.issue.id}'), 'A new comment')
+        with self.assertNumQueries(0):
+            self.client.get('/issue_list')
+
+    def test_project_change_invalidates_project_pages(self):
+        self.client.get('/project_list')
+        self.client.get(f'/project_details/{self.project.id}')
+
+        self.project.title = 'Renamed Project'
+        self.project.save()
+
+        self.assertContains(self.client.get('/project_list'), 'Renamed Project')
+        self.assertContains(self.client.get(f'/project_details/{self.project.id}'), 'Renamed Project')
+
+    def test_cached_detail_pages_still_count_visits(self):
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.client.get(f'/project_details/{self.project.id}')
+        self.client.get(f'/project_details/{self.project.id}')
+
+        self.issue.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual(self.issue.visits, 2)
+        self.assertEqual(self.project.visits, 2)
+
+    def test_anonymous_issue_page_has_no_comment_forms(self):
+        Comment.objects.create(user=self.user, text='A comment', issue=self.issue)
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'reply-link-')
+
+
+@override_settings(COMMENT_TREE_CACHE_TIMEOUT=60)
+class CommentTreeCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        self.other_user = User.objects.create(name='user2', email='user2@example.org', password='chondosha5563')
+        self.project = create_test_project(self.user)
+        self.issue = Issue.objects.create(
+            title='Test Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        self.comment = Comment.objects.create(user=self.user, text='first comment', issue=self.issue)
+        self.reply = Comment.objects.create(
+            user=self.other_user, text='first reply', issue=self.issue, parent_comment=self.comment, depth=1,
+        )
+
+    def comment_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query for query in queries if query['sql'].startswith('SELECT "issues_comment"')]
+
+    def test_tree_is_rendered_once_per_version(self):
+        self.client.force_login(
+            User.objects.create(name='user3', email='user3@example.org', password='chondosha5563')
+        )
+        first, queries = self.comment_queries(f'/issue_details/{self.issue.id}')
+        self.assertTrue(queries)
+        second, queries = self.comment_queries(f'/issue_details/{self.issue.id}')
+        self.assertEqual(queries, [])
+        self.assertContains(second, 'first reply')
+        self.assertTemplateNotUsed(second, 'comment_tree.html')
+
+    def test_comment_changes_bump_the_version(self):
+        url = f'/issue_details/{self.issue.id}'
+        self.client.get(url)
+
+        reply = Comment.objects.create(user=self.user, text='second reply', issue=self.issue, parent_comment=self.comment, depth=1)
+        self.assertContains(self.client.get(url), 'second reply')
+
+        reply.text = 'edited reply'
+        reply.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'edited reply')
+        self.assertNotContains(response, 'second reply')
+
+        reply.delete()
+        self.assertNotContains(self.client.get(url), 'edited reply')
+
+    def test_owner_controls_are_added_to_the_cached_tree(self):
+        url = f'/issue_details/{self.issue.id}'
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, f'/edit_comment/{self.comment.id}')
+        self.assertNotContains(response, f'/edit_comment/{self.reply.id}')
+
+        # the second user gets the tree the first one rendered
+        self.client.force_login(self.other_user)
+        response = self.client.get(url)
+        self.assertTemplateNotUsed(response, 'comment_tree.html')
+        self.assertContains(response, f'/edit_comment/{self.reply.id}')
+        self.assertContains(response, f'id="delete-link-{self.reply.id}"')
+        self.assertNotContains(response, f'/edit_comment/{self.comment.id}')
+        self.assertContains(response, f'id="reply-link-{self.comment.id}"')
+        self.assertNotContains(response, '<!--edit-form')
+        self.assertNotContains(response, '<!--owner-links')
+
+    def test_anonymous_visitors_get_a_tree_without_controls(self):
+        self.client.force_login(self.user)
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.client.logout()
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.assertContains(response, 'first comment')
+        self.assertNotContains(response, 'reply-link-')
+        self.assertNotContains(response, '/edit_comment/')
+
+    def test_reply_fragments_are_cached(self):
+        url = f'/comment_replies/{self.comment.id}'
+        self.client.force_login(self.other_user)
+        self.client.get(url)
+        response, queries = self.comment_queries(url)
+        # only the parent and the viewer's own reply are read
+        self.assertEqual(len(queries), 2)
+        self.assertContains(response, f'/edit_comment/{self.reply.id}')
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        self.project = create_test_project(self.user)
+        self.issue = Issue.objects.create(
+            title='Test Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+
+    def test_detail_pages_send_etag_and_last_modified(self):
+        for url in [f'/issue_details/{self.issue.id}', f'/project_details/{self.project.id}']:
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('ETag'), url)
+            self.assertTrue(response.has_header('Last-Modified'), url)
+
+    def test_unchanged_issue_page_returns_not_modified(self):
+        url = f'/issue_details/{self.issue.id}'
+        etag = self.client.get(url)['ETag']
+        with override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60):
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        visit_counter.clear()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_not_modified(self):
+        url = f'/project_details/{self.project.id}'
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_responses_still_count_visits(self):
+        url = f'/issue_details/{self.issue.id}'
+        etag = self.client.get(url)['ETag']
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.visits, 2)
+
+        url = f'/project_details/{self.project.id}'
+        etag = self.client.get(url)['ETag']
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.visits, 2)
+
+    def test_comment_changes_the_issue_etag(self):
+        url = f'/issue_details/{self.issue.id}'
+        etag = self.client.get(url)['ETag']
+        comment = Comment.objects.create(user=self.user, text='A new comment', issue=self.issue)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        comment.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_issue_changes_the_project_etag(self):
+        url = f'/project_details/{self.project.id}'
+        etag = self.client.get(url)['ETag']
+        Issue.objects.create(
+            title='Another Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_project_rename_changes_the_issue_etag(self):
+        url = f'/issue_details/{self.issue.id}'
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        time.sleep(1)
+        self.project.title = 'Renamed Project'
+        self.project.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Renamed Project')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_sidebar_order_changes_the_etag(self):
+        other = Issue.objects.create(
+            title='Other Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+        Issue.objects.filter(pk=self.issue.pk).update(hotness=2)
+        url = f'/project_details/{self.project.id}'
+        etag = self.client.get(url)['ETag']
+
+        # the reordered sidebar shows once the cached one expires
+        Issue.objects.filter(pk=other.pk).update(hotness=3)
+        cache.delete(sidebar_key('anonymous'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['issue_sidebar_list'][0], other)
+
+    def test_etag_differs_per_user(self):
+        url = f'/issue_details/{self.issue.id}'
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+
+
+class UniqueVisitorTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name='chondosha', email='user1234@example.org', password='chondosha5563')
+        self.project = create_test_project(self.user)
+        self.issue = Issue.objects.create(
+            title='Test Issue',
+            project=self.project,
+            summary='This is a test issue',
+            created_by=self.user,
+            modified_by=self.user,
+        )
+
+    def test_reloads_count_one_unique_visitor(self):
+        for i in range(3):
+            response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.visits, 3)
+        self.assertEqual(response.context['unique_visitors'], 1)
+        self.assertEqual(VisitorSketch.objects.filter(issue=self.issue).count(), 1)
+
+    def test_different_visitors_are_counted_separately(self):
+        self.client.get(f'/project_details/{self.project.id}', REMOTE_ADDR='10.0.0.1')
+        self.client.get(f'/project_details/{self.project.id}', REMOTE_ADDR='10.0.0.2')
+        self.client.force_login(self.user)
+        response = self.client.get(f'/project_details/{self.project.id}')
+        self.assertEqual(response.context['unique_visitors'], 3)
+        self.assertContains(response, 'Unique visitors (30 days): 3')
+
+    def test_hotness_grows_with_new_visitors_only(self):
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.issue.refresh_from_db()
+        hotness = self.issue.hotness
+
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.hotness, hotness)
+
+        self.client.force_login(self.user)
+        self.client.get(f'/issue_details/{self.issue.id}')
+        self.issue.refresh_from_db()
+        self.assertGreater(self.issue.hotness, hotness)
+
+    @override_settings(VISIT_COUNTER_FLUSH_INTERVAL=60)
+    def test_lower_estimate_does_not_lower_hotness(self):
+        visit_counter.record(Issue, self.issue.id, 'session:first')
+        visit_counter.flush()
+        self.issue.refresh_from_db()
+        hotness = self.issue.hotness
+
+        # the merged sketch estimates fewer visitors than the stored one
+        estimates = [7, 5]
+        visit_counter.record(Issue, self.issue.id, 'session:second')
+        with patch.object(HyperLogLog, '__len__', lambda sketch: estimates.pop()):
+            visit_counter.flush()
+        self.assertEqual(estimates, [])
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.hotness, hotness)
+        self.assertEqual(self.issue.visits, 2)
+
+    def test_sketches_are_merged_across_days(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        sketch = HyperLogLog()
+        sketch.add('session:yesterday')
+        sketch.add(f'user:{self.user.pk}')
+        VisitorSketch.objects.create(issue=self.issue, day=yesterday, registers=sketch.to_bytes())
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/issue_details/{self.issue.id}')
+        self.assertEqual(response.context['unique_visitors'], 2)
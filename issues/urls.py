@@ -20,6 +20,8 @@ urlpatterns = [
     path('reply_comment/<issue_id>/<parent_id>', views.add_comment, name='reply_comment'),
     path('edit_comment/<comment_id>', views.edit_comment, name='edit_comment'),
     path('delete_comment/<comment_id>', views.delete_comment, name='delete_comment'),
+    path('issue_comments/<issue_id>', views.issue_comments, name='issue_comments'),
+    path('comment_replies/<comment_id>', views.comment_replies, name='comment_replies'),
     path('project_list', views.ProjectListView.as_view(), name='project_list'),
     path('project_list/<filter_term>', views.ProjectListView.as_view(), name='project_list'),
     path('project_details/<project_id>', views.ProjectDetailView.as_view(), name='project_details'),
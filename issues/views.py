@@ -1,14 +1,28 @@
 from django.views.generic import ListView, DetailView
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.http import Http404
 from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-import datetime
-
-from issues.models import Issue, Project, Comment
+from django.utils.decorators import method_decorator
+
+from issues.models import Issue, Project, Comment, ArchivedIssue
+from issues.counters import visit_counter, visitor_id, unique_visitors
+from issues.comment_tree import load_comment_page, load_replies, load_archived_comment_tree
+from issues.comment_cache import render_comment_tree, add_owner_controls
+from issues.search import SearchResults, search as search_index
+from issues.pagination import PaginationMixin, InvalidCursor
+from issues.sidebar import get_sidebar_lists
+from issues.identity import identity_map
+from issues.permissions import get_permissions
+from issues.purge import mark_issue_deleted, mark_project_deleted
+from issues.tasks import purge_deleted_issue, purge_deleted_project
+from issues.page_cache import cache_anonymous_page
+from issues.conditional import conditional_page, issue_page_stamp, project_page_stamp
 from issues.forms import (
     CreateProjectForm, CreateIssueForm,
     UpdateProjectForm, UpdateIssueForm,
@@ -18,6 +32,24 @@ from issues.forms import (
 
 User = get_user_model()
 
+# the page cache tags of the detail pages, also part of their ETags
+ISSUE_PAGE_TAGS = ['issue:{issue_id}', 'issues', 'projects']
+PROJECT_PAGE_TAGS = ['projects', 'issues']
+
+
+def issue_rows():
+    # everything the issue lists show for a row, the summary is only shown
+    # on the details page
+    return (
+        Issue.objects
+        .select_related('project', 'created_by', 'modified_by', 'closed_by')
+        .defer('summary', 'project__summary')
+    )
+
+
+def project_rows():
+    return Project.objects.select_related('created_by').defer('summary')
+
 
 def home_page(request):
     if request.user.is_authenticated:
@@ -28,15 +60,12 @@ def home_page(request):
 
 def search(request):
     form = SearchForm()
-    results = []
+    results = SearchResults()
 
     if request.method == 'GET':
         form = SearchForm(request.GET)
         if form.is_valid():
-            search_query = form.cleaned_data['search_query']
-            results.extend(Project.objects.filter(title__icontains=search_query))
-            results.extend(Issue.objects.filter(title__icontains=search_query))
-            results.extend(User.objects.filter(name__icontains=search_query))
+            results = search_index(form.cleaned_data['search_query'])
 
     context = {
         'search_form': form,
@@ -61,7 +90,7 @@ class UserHome(DetailView):
         return context
 
     def get_object(self):
-        return User.objects.get(pk=self.kwargs.get('user_id'))
+        return identity_map(self.request).get(User, self.kwargs.get('user_id'))
 
 
 class UserProfile(DetailView):
@@ -78,136 +107,152 @@ class UserProfile(DetailView):
         return context
 
     def get_object(self):
-        return User.objects.get(pk=self.kwargs.get('user_id'))
+        return identity_map(self.request).get(User, self.kwargs.get('user_id'))
 
 
-class IssueListView(ListView):
+@method_decorator(cache_anonymous_page(['issues', 'projects']), name='dispatch')
+class IssueListView(PaginationMixin, ListView):
     model = Issue
     template_name = 'issue_list.html'
     paginate_by = 10
-    page_range_displayed = 8
 
     def get_queryset(self):
+        issues = issue_rows()
         if self.kwargs.get('filter_term'):
             filter = self.kwargs.get('filter_term')
             if filter == 'recent':
-                return Issue.objects.order_by('-created_on')
+                return issues.order_by('-created_on')
             if filter == 'popular':
-                return Issue.objects.order_by('-visits')
+                return issues.order_by('-hotness', '-visits', '-created_on')
             if filter == 'open':
-                return Issue.objects.filter(issue_status='Open')
+                return issues.filter(issue_status=Issue.OPEN)
             if filter == 'closed':
-                return Issue.objects.filter(issue_status='Closed')
+                return issues.filter(issue_status=Issue.CLOSED)
             if not filter:
-                return Issue.objects.all()
+                return issues
         else:
-            return Issue.objects.all()
+            return issues
 
     def get_context_data(self, **kwargs):
         context = super(IssueListView, self).get_context_data(**kwargs)
         get_sidebar_context(self.request.user, context)
 
-        paginator = context['paginator']
-        page = context['page_obj']
-        context['current_page'] = page.number
-        context['total_pages'] = paginator.num_pages
-
-        start_page = max(page.number - self.page_range_displayed//2, 1)
-        end_page = min(page.number + self.page_range_displayed//2, paginator.num_pages)
-        context['page_range'] = range(start_page, end_page+1)
-
         context['search_form'] = SearchForm()
         context['filter_term'] = self.kwargs.get('filter_term')
         return context
 
 
+@method_decorator(conditional_page(issue_page_stamp, visit=(Issue, 'issue_id'), tags=ISSUE_PAGE_TAGS), name='dispatch')
+@method_decorator(cache_anonymous_page(ISSUE_PAGE_TAGS, visit=(Issue, 'issue_id')), name='dispatch')
 class IssueDetailView(DetailView):
     model = Issue
     template_name = 'issue_details.html'
+    context_object_name = 'issue'
 
     def get_object(self):
-        issue = Issue.objects.get(pk=self.kwargs.get('issue_id'))
-        issue.visits += 1
-        issue.last_visit = datetime.datetime.now()
-        issue.save()
+        try:
+            issue = identity_map(self.request).get(
+                Issue,
+                self.kwargs.get('issue_id'),
+                Issue.objects.select_related('project', 'created_by', 'modified_by', 'closed_by'),
+            )
+        except Issue.DoesNotExist:
+            # archived issues are shown read only
+            try:
+                return identity_map(self.request).get(
+                    ArchivedIssue,
+                    self.kwargs.get('issue_id'),
+                    ArchivedIssue.objects.select_related('project', 'created_by', 'modified_by', 'closed_by'),
+                )
+            except ArchivedIssue.DoesNotExist:
+                raise Http404("No such issue")
+        visit_counter.record(Issue, issue.pk, visitor_id(self.request))
         return issue
 
-    def get_all_comment_forms(self, issue):
-        comments = Comment.objects.filter(issue=issue)
-        forms = {}
-        for comment in comments:
-            forms[comment.id] = CommentForm(user=self.request.user, issue=issue, instance=comment)
-        return forms
+    def get_template_names(self):
+        if isinstance(self.object, ArchivedIssue):
+            return ['archived_issue_details.html']
+        return super(IssueDetailView, self).get_template_names()
 
     def get_context_data(self, **kwargs):
         context = super(IssueDetailView, self).get_context_data(**kwargs)
         get_sidebar_context(self.request.user, context)
+        context['search_form'] = SearchForm()
 
-        issue = Issue.objects.get(pk=self.kwargs.get('issue_id'))
-        top_level_comments = Comment.objects.filter(issue=issue).filter(parent_comment=None)
+        issue = self.object
+        if isinstance(issue, ArchivedIssue):
+            comment_list, comments = load_archived_comment_tree(issue)
+            html = render_to_string('comment_tree.html', {'comment_list': comment_list, 'issue': issue, 'member': False})
+            context['comment_tree'] = add_owner_controls(self.request, html, {})
+            return context
 
-        context['comment_list'] = top_level_comments
-        context['edit_forms'] = self.get_all_comment_forms(issue)
-        context['search_form'] = SearchForm()
+        identities = identity_map(self.request)
+
+        def load():
+            page, comments = load_comment_page(issue, identities=identities)
+            return page.object_list, page.next_cursor, comments
+
+        html, cursor, own = render_comment_tree(self.request, issue, load, 'page')
+        edit_forms = get_edit_forms(self.request.user, issue, identities.get_many(Comment, own).values())
+
+        context['comment_tree'] = add_owner_controls(self.request, html, edit_forms)
+        context['comments_cursor'] = cursor
+        context['unique_visitors'] = unique_visitors(issue)
+        context['edit_forms'] = edit_forms
         context['user_form'] = AddUserForm()
         context['comment_form'] = CommentForm(user=self.request.user, issue=issue)
+        # one reply form for the whole thread, moved under a comment when its Reply link is clicked
+        context['reply_form'] = CommentForm(user=self.request.user, issue=issue, auto_id='reply_%s')
         return context
 
 
-class ProjectListView(ListView):
+@method_decorator(cache_anonymous_page(['projects', 'issues']), name='dispatch')
+class ProjectListView(PaginationMixin, ListView):
     model = Project
     template_name = 'project_list.html'
     paginate_by = 10
-    page_range_displayed = 8
 
     def get_queryset(self):
+        projects = project_rows()
         if self.kwargs.get('filter_term'):
             filter = self.kwargs.get('filter_term')
             if filter == 'recent':
-                return Project.objects.order_by('-created_on')
+                return projects.order_by('-created_on')
             if filter == 'popular':
-                return Project.objects.order_by('-visits')
+                return projects.order_by('-hotness', '-visits', '-created_on')
             if not filter:
-                return Project.objects.all()
+                return projects
         else:
-            return Project.objects.all()
+            return projects
 
     def get_context_data(self, **kwargs):
         context = super(ProjectListView, self).get_context_data(**kwargs)
         get_sidebar_context(self.request.user, context)
 
-        paginator = context['paginator']
-        page = context['page_obj']
-        context['current_page'] = page.number
-        context['total_pages'] = paginator.num_pages
-
-        start_page = max(page.number - self.page_range_displayed//2, 1)
-        end_page = min(page.number + self.page_range_displayed//2, paginator.num_pages)
-        context['page_range'] = range(start_page, end_page+1)
-
         context['search_form'] = SearchForm()
         context['filter_term'] = self.kwargs.get('filter_term')
         return context
 
 
-class ProjectDetailView(ListView):
+@method_decorator(conditional_page(project_page_stamp, visit=(Project, 'project_id'), tags=PROJECT_PAGE_TAGS), name='dispatch')
+@method_decorator(cache_anonymous_page(PROJECT_PAGE_TAGS, visit=(Project, 'project_id')), name='dispatch')
+class ProjectDetailView(PaginationMixin, ListView):
     model = Issue
     template_name = 'project_details.html'
     paginate_by = 10
-    page_range_displayed = 8
 
     def get_queryset(self):
-        project = Project.objects.get(pk=self.kwargs.get('project_id'))
-        issues = Issue.objects.filter(project=project)
+        self.project = identity_map(self.request).get(Project, self.kwargs.get('project_id'))
+        issues = issue_rows().filter(project=self.project)
 
         if self.kwargs.get('filter_term'):
             filter = self.kwargs.get('filter_term')
             if filter == 'open':
-                return issues.filter(issue_status='Open').order_by('-created_on')
+                return issues.filter(issue_status=Issue.OPEN).order_by('-created_on')
             if filter == 'closed':
-                return issues.filter(issue_status='Closed').order_by('-created_on')
+                return issues.filter(issue_status=Issue.CLOSED).order_by('-created_on')
             if filter == 'priority':
-                return issues.filter(issue_status='Open').order_by('-priority')
+                return issues.filter(issue_status=Issue.OPEN).order_by('-priority')
             if not filter:
                 return issues.order_by('-created_on')
         else:
@@ -217,20 +262,11 @@ class ProjectDetailView(ListView):
         context = super(ProjectDetailView, self).get_context_data(**kwargs)
         get_sidebar_context(self.request.user, context)
 
-        project = Project.objects.get(pk=self.kwargs.get('project_id'))
-        project.visits += 1
-        project.save()
-
-        paginator = context['paginator']
-        page = context['page_obj']
-        context['current_page'] = page.number
-        context['total_pages'] = paginator.num_pages
-
-        start_page = max(page.number - self.page_range_displayed//2, 1)
-        end_page = min(page.number + self.page_range_displayed//2, paginator.num_pages)
-        context['page_range'] = range(start_page, end_page+1)
+        project = self.project
+        visit_counter.record(Project, project.pk, visitor_id(self.request))
 
         context['project'] = project
+        context['unique_visitors'] = unique_visitors(project)
         context['search_form'] = SearchForm()
         context['user_form'] = AddUserForm()
         return context
@@ -258,7 +294,7 @@ def create_project(request):
 @login_required(login_url='login')
 def update_project(request, project_id):
     user = request.user
-    project = Project.objects.get(id=project_id)
+    project = identity_map(request).get(Project, project_id)
     form = UpdateProjectForm(user=user, instance=project)
     if request.method == 'POST':
         form = UpdateProjectForm(data=request.POST, user=user, instance=project)
@@ -279,10 +315,11 @@ def update_project(request, project_id):
 @login_required(login_url='login')
 def delete_project(request, project_id):
     user = request.user
-    project = Project.objects.get(id=project_id)
+    project = identity_map(request).get(Project, project_id)
     if request.method == 'POST':
         if project.created_by == user:
-            project.delete()
+            mark_project_deleted(project)
+            purge_deleted_project.enqueue(project.pk)
             return redirect('issues:user_home', user_id=user.pk)
 
     return redirect('issues:project_details', project_id=project_id)
@@ -290,12 +327,12 @@ def delete_project(request, project_id):
 
 @login_required(login_url='login')
 def add_user_to_project(request, project_id):
-    project = Project.objects.get(id=project_id)
+    project = identity_map(request).get(Project, project_id)
     if request.method == 'POST':
-        form = AddUserForm(request.POST)
+        form = AddUserForm(request.POST, identities=identity_map(request))
         if form.is_valid():
             username = form.cleaned_data['username']
-            user = User.objects.get(name=username)
+            user = identity_map(request).get_by(User, name=username)
             project.assigned_users.add(user)
             project.save()
             return redirect('issues:project_details', project_id=project.id)
@@ -305,12 +342,12 @@ def add_user_to_project(request, project_id):
 
 @login_required(login_url='login')
 def remove_user_from_project(request, project_id):
-    project = Project.objects.get(id=project_id)
+    project = identity_map(request).get(Project, project_id)
     if request.method == 'POST':
-        form = AddUserForm(request.POST)
+        form = AddUserForm(request.POST, identities=identity_map(request))
         if form.is_valid():
             username = form.cleaned_data['username']
-            user = User.objects.get(name=username)
+            user = identity_map(request).get_by(User, name=username)
             if project.assigned_users.count() > 1:
                 project.assigned_users.remove(user)
                 project.save()
@@ -322,7 +359,7 @@ def remove_user_from_project(request, project_id):
 @login_required(login_url='login')
 def create_issue(request, project_id):
     user = request.user
-    project = Project.objects.get(id=project_id)
+    project = identity_map(request).get(Project, project_id)
     form = CreateIssueForm(user=user, project=project)
     if request.method == 'POST':
         form = CreateIssueForm(data=request.POST, user=user, project=project)
@@ -343,7 +380,7 @@ def create_issue(request, project_id):
 @login_required(login_url='login')
 def update_issue(request, issue_id):
     user = request.user
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id, Issue.objects.select_related('project'))
     project = issue.project
     form = UpdateIssueForm(user=user, project=project, instance=issue)
     if request.method == 'POST':
@@ -365,11 +402,12 @@ def update_issue(request, issue_id):
 @login_required(login_url='login')
 def delete_issue(request, issue_id):
     user = request.user
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id, Issue.objects.select_related('project', 'created_by'))
     project = issue.project
     if request.method == 'POST':
         if issue.created_by == user:
-            issue.delete()
+            mark_issue_deleted(issue)
+            purge_deleted_issue.enqueue(issue.pk)
             return redirect('issues:project_details', project_id=project.id)
 
     return redirect('issues:issue_details', issue_id=issue.id)
@@ -377,12 +415,12 @@ def delete_issue(request, issue_id):
 
 @login_required(login_url='login')
 def add_user_to_issue(request, issue_id):
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id)
     if request.method == 'POST':
-        form = AddUserForm(request.POST)
+        form = AddUserForm(request.POST, identities=identity_map(request))
         if form.is_valid():
             username = form.cleaned_data['username']
-            user = User.objects.get(name=username)
+            user = identity_map(request).get_by(User, name=username)
             issue.assigned_users.add(user)
             issue.save()
             return redirect('issues:issue_details', issue_id=issue.id)
@@ -392,12 +430,12 @@ def add_user_to_issue(request, issue_id):
 
 @login_required(login_url='login')
 def remove_user_from_issue(request, issue_id):
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id)
     if request.method == 'POST':
-        form = AddUserForm(request.POST)
+        form = AddUserForm(request.POST, identities=identity_map(request))
         if form.is_valid():
             username = form.cleaned_data['username']
-            user = User.objects.get(name=username)
+            user = identity_map(request).get_by(User, name=username)
             if issue.assigned_users.count() > 1:
                 issue.assigned_users.remove(user)
                 issue.save()
@@ -409,11 +447,12 @@ def remove_user_from_issue(request, issue_id):
 @login_required(login_url='login')
 def open_issue(request, issue_id):
     user = request.user
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id)
     if request.method == 'POST':
-        if issue.issue_status == 'Closed' and user in issue.assigned_users.all():
-            issue.issue_status = 'Open'
+        if not issue.is_open and get_permissions(request).is_assigned_to_issue(issue):
+            issue.issue_status = Issue.OPEN
             issue.closed_by = None
+            issue.closed_on = None
             issue.save()
             return redirect('issues:issue_details', issue_id=issue.id)
 
@@ -423,11 +462,12 @@ def open_issue(request, issue_id):
 @login_required(login_url='login')
 def close_issue(request, issue_id):
     user = request.user
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id)
     if request.method == 'POST':
-        if issue.issue_status == 'Open' and user in issue.assigned_users.all():
-            issue.issue_status = 'Closed'
+        if issue.is_open and get_permissions(request).is_assigned_to_issue(issue):
+            issue.issue_status = Issue.CLOSED
             issue.closed_by = user
+            issue.closed_on = timezone.now()
             issue.save()
             return redirect('issues:issue_details', issue_id=issue.id)
 
@@ -437,9 +477,9 @@ def close_issue(request, issue_id):
 @login_required(login_url='login')
 def add_comment(request, issue_id, parent_id=None):
     user = request.user
-    issue = Issue.objects.get(id=issue_id)
+    issue = identity_map(request).get(Issue, issue_id)
     if parent_id:
-        parent_comment = Comment.objects.get(id=parent_id)
+        parent_comment = identity_map(request).get(Comment, parent_id)
     else:
         parent_comment = None
 
@@ -455,7 +495,7 @@ def add_comment(request, issue_id, parent_id=None):
 @login_required(login_url='login')
 def edit_comment(request, comment_id):
     user = request.user
-    comment = Comment.objects.get(id=comment_id)
+    comment = identity_map(request).get(Comment, comment_id, Comment.objects.select_related('issue', 'parent_comment'))
     issue = comment.issue
     if request.method == 'POST':
         form = CommentForm(data=request.POST, user=user, issue=issue, parent=comment.parent_comment, instance=comment)
@@ -469,7 +509,7 @@ def edit_comment(request, comment_id):
 @login_required(login_url='login')
 def delete_comment(request, comment_id):
     user = request.user
-    comment = Comment.objects.get(id=comment_id)
+    comment = identity_map(request).get(Comment, comment_id, Comment.objects.select_related('issue', 'user'))
     issue = comment.issue
     if request.method == 'POST':
         if user == comment.user:
@@ -479,13 +519,77 @@ def delete_comment(request, comment_id):
     return redirect('issues:issue_details', issue_id=issue.id)
 
 
-def get_sidebar_context(user, context):
+def issue_comments(request, issue_id):
+    identities = identity_map(request)
+    try:
+        issue = identities.get(Issue, issue_id)
+    except Issue.DoesNotExist:
+        raise Http404("No such issue")
+    cursor = request.GET.get('cursor')
+
+    def load():
+        page, comments = load_comment_page(issue, cursor, identities)
+        return page.object_list, page.next_cursor, comments
+
+    return render_comment_fragment(
+        request, issue, load, ('page', cursor),
+        reverse('issues:issue_comments', args=[issue.id]), 'More comments',
+    )
+
+
+def comment_replies(request, comment_id):
+    identities = identity_map(request)
+    try:
+        # replies of a deleted issue or project stay hidden until the purge
+        parent = identities.get(Comment, comment_id, Comment.objects.select_related('issue').filter(
+            issue__pending_delete=False, issue__project__pending_delete=False,
+        ))
+    except Comment.DoesNotExist:
+        raise Http404("No such comment")
+    cursor = request.GET.get('cursor')
+
+    def load():
+        page = load_replies(parent, cursor, identities)
+        return page.object_list, page.next_cursor, page.object_list
+
+    return render_comment_fragment(
+        request, parent.issue, load, ('replies', parent.id, cursor),
+        reverse('issues:comment_replies', args=[parent.id]), 'More replies',
+    )
+
+
+def render_comment_fragment(request, issue, load, key, more_url, more_label):
+    try:
+        html, cursor, own = render_comment_tree(request, issue, load, *key)
+    except InvalidCursor:
+        raise Http404("Invalid cursor")
+    edit_forms = get_edit_forms(request.user, issue, identity_map(request).get_many(Comment, own).values())
+
+    context = {
+        'comment_tree': add_owner_controls(request, html, edit_forms),
+        'edit_forms': edit_forms,
+        'more_label': more_label,
+    }
+    if cursor:
+        context['more_url'] = more_url
+        context['more_cursor'] = cursor
+    return render(request, 'comment_fragment.html', context)
+
+
+def get_edit_forms(user, issue, comments):
+    # only the viewer's own comments can be edited
+    forms = {}
     if user.is_authenticated:
-        context['project_sidebar_list'] = user.projects_assigned.all().order_by('-modified_on')[:5]
-        context['issue_sidebar_list'] = user.issues_assigned.all().order_by('-last_visit')[:5]
-    else:
-        context['project_sidebar_list'] = Project.objects.order_by('-visits')[:5]
-        context['issue_sidebar_list'] = Issue.objects.order_by('-visits')[:5]
+        for comment in comments:
+            if comment.user_id == user.pk:
+                forms[comment.id] = CommentForm(user=user, issue=issue, instance=comment)
+    return forms
+
+
+def get_sidebar_context(user, context):
+    issues, projects = get_sidebar_lists(user)
+    context['issue_sidebar_list'] = issues
+    context['project_sidebar_list'] = projects
 
 
 def add_pagination(request, items, context):
@@ -495,7 +599,14 @@ def add_pagination(request, items, context):
     else:
         page_number = 1
     page_obj = paginator.get_page(page_number)
+    page_number = page_obj.number
     context['page_obj'] = page_obj
+    context['paginator'] = paginator
+
+    # keep the other query parameters (e.g. the search query) on page links
+    query = request.GET.copy()
+    query.pop('page', None)
+    context['page_query'] = query.urlencode() + '&' if query else ''
 
     context['current_page'] = page_number
     context['total_pages'] = paginator.num_pages
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tasks.queue import work
+
+
+class Command(BaseCommand):
+    help = "Run queued tasks on a pool of threads, retrying failed ones with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help="tasks run at the same time")
+        parser.add_argument('--poll-interval', type=float, help="seconds to wait when no task is due")
+        parser.add_argument('--once', action='store_true', help="stop once no task is due")
+
+    def handle(self, *args, **options):
+        try:
+            ran = work(options['threads'], options['once'], options['poll_interval'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(f"Ran {ran} tasks")
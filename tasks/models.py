@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class Job(models.Model):
+    # One call of a @task function waiting to run. Finished jobs are deleted,
+    # failed ones are kept with their last error.
+    QUEUED = 1
+    RUNNING = 2
+    FAILED = 3
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=1)
+    run_at = models.DateTimeField()
+    started_at = models.DateTimeField(default=None, null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections
+from django.db.models import F
+from django.utils import timezone
+
+from issues.middleware import deferred_queries
+from tasks.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class Task:
+    # A function the worker can run later. Calling the task runs it right
+    # away, enqueue() stores the call as a Job, so the arguments have to be
+    # JSON. With TASKS_EAGER the call runs inside enqueue() instead.
+
+    def __init__(self, func, name, max_attempts):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        # the round trip catches arguments the job table could not store
+        args, kwargs = json.loads(json.dumps([args, kwargs]))
+        if getattr(settings, 'TASKS_EAGER', False):
+            # a deployment runs this in the worker, not in the request
+            with deferred_queries():
+                self.func(*args, **kwargs)
+            return None
+        return Job.objects.create(
+            name=self.name,
+            args=args,
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now(),
+        )
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    def decorator(func):
+        registered = Task(
+            func,
+            name or f'{func.__module__}.{func.__qualname__}',
+            max_attempts or getattr(settings, 'TASKS_MAX_ATTEMPTS', 5),
+        )
+        registry[registered.name] = registered
+        return registered
+    return decorator(func) if func is not None else decorator
+
+
+def retry_delay(attempts):
+    # doubles with every failed attempt, up to TASKS_MAX_RETRY_DELAY
+    delay = getattr(settings, 'TASKS_RETRY_DELAY', 10) * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, getattr(settings, 'TASKS_MAX_RETRY_DELAY', 3600)))
+
+
+def requeue_stale_jobs():
+    # Jobs still running after TASKS_JOB_TIMEOUT belonged to a worker that
+    # died. The ones that used up their attempts fail, so a job that kills
+    # its worker is not run forever.
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TASKS_JOB_TIMEOUT', 600))
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='The worker running the job stopped before it finished.',
+    )
+    return stale.update(status=Job.QUEUED, started_at=None)
+
+
+def claim_job():
+    # The first due job this worker manages to switch to running. The
+    # conditional UPDATE makes the claim safe between worker processes
+    # without row locks.
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    for pk in due.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def with_retries(write, attempts=5):
+    # SQLite refuses a write while another connection holds the table lock,
+    # the job bookkeeping waits and tries again
+    for attempt in range(attempts):
+        try:
+            return write()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def execute(job):
+    # runs the task of a claimed job, returns the traceback if it failed
+    try:
+        registry[job.name].func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Task %s failed on attempt %s", job, job.attempts)
+        return traceback.format_exc()
+    return None
+
+
+def execute_in_thread(job):
+    try:
+        return execute(job)
+    finally:
+        connections.close_all()
+
+
+def finish(job, error):
+    # records the outcome: done jobs are deleted, failed ones retried after
+    # a delay until their last attempt
+    if error is None:
+        Job.objects.filter(pk=job.pk).delete()
+    elif job.name in registry and job.attempts < job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED, run_at=timezone.now() + retry_delay(job.attempts), started_at=None, last_error=error,
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED, last_error=error)
+
+
+def run_job(job):
+    # runs a claimed job, returns whether it succeeded
+    error = execute(job)
+    finish(job, error)
+    return error is None
+
+
+def finish_done(running, block=False, timeout=None):
+    # records the jobs whose threads are done, from the claiming thread so
+    # the pool threads never write to the job table
+    if block and running:
+        wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+    for future in [future for future in running if future.done()]:
+        job = running.pop(future)
+        try:
+            error = future.result()
+        except BaseException:
+            logger.exception("Task %s crashed its thread", job)
+            error = traceback.format_exc()
+        try:
+            with_retries(lambda: finish(job, error))
+        except DatabaseError:
+            # left running, so the job is run again once it counts as stale
+            logger.exception("Could not record the outcome of task %s", job)
+
+
+def work(threads=None, once=False, poll_interval=None, stop=None):
+    # Claims due jobs and runs them on a pool of threads until `stop` is
+    # set, or until nothing is due or running when `once` is given.
+    # Returns the number of jobs run.
+    threads = threads or getattr(settings, 'TASKS_WORKER_THREADS', 4)
+    poll_interval = poll_interval if poll_interval is not None else getattr(settings, 'TASKS_POLL_INTERVAL', 1)
+    stop = stop or threading.Event()
+    running = {}
+    ran = 0
+    requeued_at = None
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='tasks') as pool:
+        try:
+            while not stop.is_set():
+                # another worker may have died since the last poll
+                if requeued_at is None or time.monotonic() - requeued_at >= poll_interval:
+                    with_retries(requeue_stale_jobs)
+                    requeued_at = time.monotonic()
+                finish_done(running)
+                if len(running) >= threads:
+                    finish_done(running, block=True)
+                    continue
+                job = with_retries(claim_job)
+                if job is None:
+                    if once and not running:
+                        break
+                    if running:
+                        finish_done(running, block=True, timeout=poll_interval)
+                    else:
+                        stop.wait(poll_interval)
+                    continue
+                ran += 1
+                running[pool.submit(execute_in_thread, job)] = job
+        finally:
+            while running:
+                finish_done(running, block=True)
+    return ran
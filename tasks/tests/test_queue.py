@@ -0,0 +1,232 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from tasks.models import Job
+from tasks import queue
+from tasks.queue import task, registry, claim_job, run_job, requeue_stale_jobs, retry_delay, work
+
+calls = []
+
+
+@task
+def record(value, times=1):
+    calls.append(value * times)
+
+
+@task(max_attempts=3)
+def flaky(fail_times):
+    calls.append('try')
+    if len(calls) <= fail_times:
+        raise ValueError('not yet')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10, TASKS_MAX_RETRY_DELAY=60)
+class QueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_tasks_are_registered_by_name(self):
+        self.assertIs(registry['tasks.tests.test_queue.record'], record)
+        self.assertIn('accounts.tasks.send_password_reset_email', registry)
+        self.assertIn('issues.tasks.purge_deleted_issue', registry)
+
+    def test_calling_a_task_runs_it(self):
+        record('a', times=2)
+        self.assertEqual(calls, ['aa'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_enqueue_stores_a_job(self):
+        job = record.enqueue('a', times=2)
+        self.assertEqual(calls, [])
+        job.refresh_from_db()
+        self.assertEqual((job.name, job.args, job.kwargs, job.status), (record.name, ['a'], {'times': 2}, Job.QUEUED))
+
+        self.assertTrue(run_job(claim_job()))
+        self.assertEqual(calls, ['aa'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_arguments_must_be_json(self):
+        with self.assertRaises(TypeError):
+            record.enqueue(object())
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_the_task_at_once(self):
+        self.assertIsNone(record.enqueue('a'))
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_only_due_jobs_are_claimed(self):
+        record.enqueue('a')
+        Job.objects.update(run_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(claim_job())
+
+        Job.objects.update(run_at=timezone.now())
+        job = claim_job()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertIsNone(claim_job())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        flaky.enqueue(fail_times=2)
+
+        with self.assertLogs('tasks.queue', 'ERROR') as logs:
+            self.assertFalse(run_job(claim_job()))
+        self.assertIn('failed on attempt 1', logs.output[0])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('ValueError: not yet', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertIsNone(claim_job())
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(run_job(claim_job()))
+        self.assertGreater(Job.objects.get().run_at, timezone.now() + timedelta(seconds=19))
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertTrue(run_job(claim_job()))
+        self.assertEqual(calls, ['try', 'try', 'try'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_delay_doubles_up_to_the_limit(self):
+        self.assertEqual([retry_delay(n).seconds for n in range(1, 6)], [10, 20, 40, 60, 60])
+
+    def test_job_fails_after_its_last_attempt(self):
+        flaky.enqueue(fail_times=5)
+        for i in range(3):
+            Job.objects.update(run_at=timezone.now())
+            with self.assertLogs('tasks.queue', 'ERROR'):
+                self.assertFalse(run_job(claim_job()))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIsNone(claim_job())
+
+    def test_unknown_task_fails_without_retrying(self):
+        Job.objects.create(name='tasks.gone', max_attempts=5, run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(run_job(claim_job()))
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    @override_settings(TASKS_JOB_TIMEOUT=60)
+    def test_stale_running_jobs_are_requeued(self):
+        record.enqueue('a')
+        claim_job()
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+        Job.objects.update(started_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertTrue(run_job(claim_job()))
+        self.assertEqual(calls, ['a'])
+
+    @override_settings(TASKS_JOB_TIMEOUT=60)
+    def test_stale_job_fails_after_its_last_attempt(self):
+        job = flaky.enqueue(0)
+        Job.objects.update(status=Job.RUNNING, attempts=3, started_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('stopped', job.last_error)
+
+
+@override_settings(TASKS_EAGER=False)
+class WorkerTest(TransactionTestCase):
+    # the worker threads use their own connections, so the jobs have to be committed
+
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_due_jobs_on_threads(self):
+        for i in range(6):
+            record.enqueue(i)
+        self.assertEqual(work(threads=3, once=True), 6)
+        self.assertEqual(sorted(calls), list(range(6)))
+        self.assertFalse(Job.objects.exists())
+
+    def test_results_are_written_from_the_claiming_thread(self):
+        writers = []
+        finish = queue.finish
+
+        def record_writer(job, error):
+            writers.append(threading.current_thread())
+            finish(job, error)
+
+        for i in range(6):
+            record.enqueue(i)
+        with mock.patch('tasks.queue.finish', side_effect=record_writer):
+            work(threads=3, once=True)
+        self.assertEqual(writers, [threading.current_thread()] * 6)
+        self.assertFalse(Job.objects.exists())
+
+    def test_locked_job_table_is_retried(self):
+        finish = queue.finish
+        attempts = []
+
+        def locked_once(job, error):
+            attempts.append(job)
+            if len(attempts) == 1:
+                raise OperationalError('database table is locked')
+            finish(job, error)
+
+        record.enqueue('a')
+        with mock.patch('tasks.queue.finish', side_effect=locked_once):
+            self.assertEqual(work(threads=1, once=True), 1)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_crashed_thread_is_logged_and_retried(self):
+        job = record.enqueue('a')
+        with mock.patch('tasks.queue.execute_in_thread', side_effect=RuntimeError('boom')):
+            with self.assertLogs('tasks.queue', 'ERROR') as logs:
+                work(threads=1, once=True)
+        self.assertIn('crashed its thread', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+
+    @override_settings(TASKS_JOB_TIMEOUT=60)
+    def test_running_worker_picks_up_jobs_of_a_dead_one(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=work, kwargs={'threads': 1, 'poll_interval': 0.01, 'stop': stop})
+        worker.start()
+        try:
+            # left behind by a worker that died after this one started
+            started = timezone.now() - timedelta(minutes=2)
+            Job.objects.create(
+                name=record.name, args=['a'], status=Job.RUNNING, attempts=1, max_attempts=5,
+                run_at=started, started_at=started,
+            )
+            for _ in range(500):
+                if not Job.objects.exists():
+                    break
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            worker.join(timeout=5)
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_worker_stops_when_asked(self):
+        stop = threading.Event()
+        record.enqueue('a')
+        worker = threading.Thread(target=work, kwargs={'threads': 2, 'poll_interval': 0.01, 'stop': stop})
+        worker.start()
+        stop.set()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+
+    def test_command_reports_tasks_run(self):
+        record.enqueue('a')
+        out = StringIO()
+        call_command('run_tasks', once=True, threads=1, stdout=out)
+        self.assertIn('Ran 1 tasks', out.getvalue())
+        self.assertEqual(calls, ['a'])